@@ -1,3 +1,4 @@
+import functools
 import time
 
 from performance_types import TimedArgument
@@ -10,10 +11,13 @@ class RegularTimedArgument(TimedArgument):
         self.description: str = description or str(argument)
 
     def apply(self, f: Callable) -> float:
-        start: float = time.time()
+        start: int = time.perf_counter_ns()
         f(self.value)
-        end: float = time.time()
-        return end - start
+        end: int = time.perf_counter_ns()
+        return (end - start) / 1e9
+
+    def bind(self, f: Callable) -> Callable[[], Any]:
+        return functools.partial(f, self.value)
 
     def print(self) -> None:
         print(f'| {self.description[:9]:>9} |')
@@ -25,10 +29,13 @@ class RegularTimedArgument(TimedArgument):
 
 class VacuousTimedArgument(TimedArgument):
     def apply(self, f: Callable) -> float:
-        start: float = time.time()
+        start: int = time.perf_counter_ns()
         f()
-        end: float = time.time()
-        return end - start
+        end: int = time.perf_counter_ns()
+        return (end - start) / 1e9
+
+    def bind(self, f: Callable) -> Callable[[], Any]:
+        return f
 
     def print(self) -> None:
         print()
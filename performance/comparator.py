@@ -1,10 +1,15 @@
 from collections import Counter
 
-from typing import List, Callable, Any, Sequence
-from performance_types import Comparator, Printer, Measurement, TimedArgument
+from typing import List, Callable, Any, Optional, Sequence
+from performance_types import Comparator, Printer, Measurement, TimedArgument, Timer, Runner
 from printer import PerformancePrinter
 from measurement import PerformanceMeasurement
 from argument import RegularTimedArgument, VacuousTimedArgument
+from isolated_runner import IsolatedRunner
+from memory_usage import MemoryUsage
+from interleaved_runner import InterleavedRunner
+from sample_statistics import is_significantly_slower
+from timer import BatchTimer
 
 
 class PerformanceComparator(Comparator):
@@ -18,16 +23,39 @@ class PerformanceComparator(Comparator):
     rows correspond to arguments; to customise the name of the row and argument can be passed as an instance of a class
     with fields 'description' and 'value'."""
 
-    def __init__(self, functions: Sequence[Callable], arguments: Sequence[Any] = (), count: int = 1000) -> None:
-
+    def __init__(self, functions: Sequence[Callable], arguments: Sequence[Any] = (), count: Optional[int] = None,
+                 timer: Optional[Timer] = None, early_stopping: bool = False, confidence: float = .95,
+                 runner: Optional[Runner] = None, memory: bool = False) -> None:
+        """
+        :param count: number of calls of every function with every argument;
+            by default the calls are timed in batches sized and repeated to take about the target time of the timer
+        :param timer: by default a BatchTimer
+        :param early_stopping: whether to stop measuring an argument once the ordering of the functions is significant
+        :param confidence: level of the bootstrap confidence intervals telling whether the differences are significant;
+            ratios within the noise are printed with a tilde,
+            ones measured in too few batches to tell the noise by with a question mark
+        :param runner: runner measuring the functions elsewhere, e.g. an IsolatedRunner measuring each of them
+            with each argument in a process of its own or an InterleavedRunner measuring all of them in shuffled blocks;
+            by default they are measured one after another in this process
+        :param memory: whether to measure the memory taken by a single call of every function with every argument,
+            traced after the timing so as not to slow it; printed as the peak and net bytes, the blocks allocated
+            and the resident bytes next to the times, the resident ones only as measured by an IsolatedRunner
+        """
+        if runner is not None and early_stopping:
+            raise ValueError('early stopping needs the functions measured in this process')
         self.__funcs: Sequence[Callable] = functions
         self.__args: Sequence[TimedArgument] = self.__wrap_arguments(arguments)
-        self.__count: int = count
+        self.__count: Optional[int] = count
+        self.__timer: Timer = timer or BatchTimer()
+        self.__early_stopping: bool = early_stopping
+        self.__confidence: float = confidence
+        self.__runner: Optional[Runner] = runner
+        self.__memory: bool = memory
 
         self.__measurements: Sequence[Measurement] = self.__measure_arguments()
         self.__sort_measured_functions()
 
-        self.__printer: Printer = PerformancePrinter()
+        self.__printer: Printer = PerformancePrinter(memory)
 
     def __wrap_arguments(self, arguments: Sequence[Any]) -> List[TimedArgument]:
         return [self.__wrap_regular_argument(arg) for arg in arguments] if arguments else [VacuousTimedArgument()]
@@ -40,7 +68,20 @@ class PerformanceComparator(Comparator):
             return RegularTimedArgument(argument)
 
     def __measure_arguments(self) -> List[Measurement]:
-        return [PerformanceMeasurement(self.__funcs, argument, self.__count) for argument in self.__args]
+        if self.__runner is not None:
+            samples: List[List[Sequence[float]]] = self.__runner.run(self.__funcs, self.__args, self.__count,
+                                                                     self.__timer, self.__memory)
+            blocks: List[Optional[List[Sequence[int]]]] = self.__runner.get_blocks() or [None] * len(self.__args)
+            usages: List[Optional[List[MemoryUsage]]] = self.__runner.get_memory() or [None] * len(self.__args)
+            return [PerformanceMeasurement(self.__funcs, argument, self.__count, self.__timer,
+                                           confidence=self.__confidence, samples=argument_samples,
+                                           blocks=argument_blocks, memory=self.__memory,
+                                           memory_usage=argument_usages)
+                    for argument, argument_samples, argument_blocks, argument_usages
+                    in zip(self.__args, samples, blocks, usages)]
+        return [PerformanceMeasurement(self.__funcs, argument, self.__count, self.__timer, self.__early_stopping,
+                                       self.__confidence, memory=self.__memory)
+                for argument in self.__args]
 
     def __sort_measured_functions(self) -> None:
         ordering: List[int] = self.__produce_final_ordering()
@@ -74,9 +115,53 @@ class PerformanceComparator(Comparator):
         return sorted_indices
 
     def __sort_using_ordering(self, ordering: Sequence[int]):
+        self.__funcs = [self.__funcs[i] for i in ordering]
         for measurement in self.__measurements:
             measurement.sort(ordering)
 
+    def get_functions(self) -> List[Callable]:
+        """functions from the fastest one, in the order of the columns of results."""
+        return list(self.__funcs)
+
+    def get_results(self) -> List[List[float]]:
+        """mean execution times of the functions, one row for every argument."""
+        return [measurement.get_results() for measurement in self.__measurements]
+
+    def get_ratios(self) -> List[List[float]]:
+        """percents every function took longer than the fastest one, one row for every argument."""
+        return [measurement.get_ratios() for measurement in self.__measurements]
+
+    def get_samples(self) -> List[List[Sequence[float]]]:
+        """seconds taken by a single call in every batch measured, for every argument and function."""
+        return [measurement.get_samples() for measurement in self.__measurements]
+
+    def get_blocks(self) -> List[Optional[List[Sequence[int]]]]:
+        """blocks every sample was measured in, for every argument and function, if measured in blocks."""
+        return [measurement.get_blocks() for measurement in self.__measurements]
+
+    def get_significance(self) -> List[List[Optional[bool]]]:
+        """whether every function is significantly slower than the fastest one, one row for every argument;
+        None where it cannot be told."""
+        return [measurement.get_significance() for measurement in self.__measurements]
+
+    def get_memory(self) -> List[Optional[List[MemoryUsage]]]:
+        """memory taken by a single call of every function, one row for every argument, if measured."""
+        return [measurement.get_memory() for measurement in self.__measurements]
+
+    def get_ranking_verdict(self) -> List[Optional[bool]]:
+        """whether every function is significantly slower than the one before it in the ranking for all arguments;
+        None where it is not told otherwise for any of them but cannot be told for some."""
+        return [self.__combine_verdicts([
+            is_significantly_slower(statistics[position + 1], statistics[position], self.__confidence)
+            for statistics in (measurement.get_statistics() for measurement in self.__measurements)
+        ]) for position in range(len(self.__funcs) - 1)]
+
+    @staticmethod
+    def __combine_verdicts(verdicts: Sequence[Optional[bool]]) -> Optional[bool]:
+        if False in verdicts:
+            return False
+        return None if None in verdicts else True
+
     def print(self) -> None:
         header_length: int = self.__printer.print_header(self.__funcs, self.__args)
         self.__printer.print_measurements_row(self.__measurements, header_length)
@@ -102,5 +187,34 @@ if __name__ == '__main__':
 
     print()
 
-    # comparison of two functions without an argument
-    PerformanceComparator([lambda: function_one(10), lambda: function_two(7)]).print()
+    # comparison of two functions without an argument, stopped once the difference is significant
+    comparator = PerformanceComparator([lambda: function_one(10), lambda: function_two(7)], early_stopping=True)
+    comparator.print()
+    print(comparator.get_ranking_verdict())
+
+    print()
+
+    # the same comparison, each function measured in a process of its own with the garbage collector disabled
+    PerformanceComparator([lambda: function_one(10), lambda: function_two(7)],
+                          runner=IsolatedRunner(warmup=2, disable_gc=True, cpus=[0])).print()
+
+    print()
+
+    # comparison of two functions with two arguments, all measured in turn in shuffled blocks
+    PerformanceComparator([function_one, function_two], (12, TwentyFive()), runner=InterleavedRunner(seed=0)).print()
+
+    print()
+
+    # comparison of two functions building lists, with the memory taken by a call, each measured in a process of its own
+    def build_list(length):
+        """list"""
+        return list(range(length))
+
+    def build_tuple(length):
+        """tuple"""
+        return tuple(range(length))
+
+    comparator = PerformanceComparator([build_list, build_tuple], (1000, 100000), runner=IsolatedRunner(),
+                                       memory=True)
+    comparator.print()
+    print(comparator.get_memory()[0])
@@ -0,0 +1,56 @@
+import random
+
+from array import array
+from measurement import empty_function
+from performance_types import Runner, TimedArgument, Timer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class InterleavedRunner(Runner):
+    """runner measuring all the functions with all the arguments in blocks, each block taking a single batch
+    of every (function, argument) pair still to be measured, in an order shuffled anew for every block.
+    a drift of the speed of the machine during the run, due to throttling or background load, is spread evenly
+    over the functions then rather than falling on the ones measured at the time.
+    the block of every sample is recorded, so that the functions can be compared within the blocks."""
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        """
+        :param seed: seed of the shuffling of the blocks
+        """
+        self.seed: Optional[int] = seed
+        self.__blocks: Optional[List[List[array]]] = None
+
+    def run(self, functions: Sequence[Callable], arguments: Sequence[TimedArgument], count: Optional[int],
+            timer: Timer, memory: bool = False) -> List[List[array]]:
+        generator: random.Random = random.Random(self.seed)
+        cells: List[Tuple[int, int]] = [(argument_index, function_index) for argument_index in range(len(arguments))
+                                        for function_index in range(len(functions))]
+        overheads: List[float] = [timer.calibrate(argument.bind(empty_function)) for argument in arguments]
+        calls: Dict[Tuple[int, int], Callable[[], Any]] = {
+            cell: arguments[cell[0]].bind(functions[cell[1]]) for cell in cells
+        }
+        plans: Dict[Tuple[int, int], Tuple[int, int]] = {cell: timer.plan(calls[cell], count) for cell in cells}
+        samples: Dict[Tuple[int, int], array] = {cell: array('d') for cell in cells}
+        blocks: Dict[Tuple[int, int], array] = {cell: array('l') for cell in cells}
+
+        remaining: List[Tuple[int, int]] = list(cells)
+        block: int = 0
+        while remaining:
+            generator.shuffle(remaining)
+            for cell in remaining:
+                samples[cell].append(timer.sample(calls[cell], overheads[cell[0]], plans[cell][0]))
+                blocks[cell].append(block)
+            remaining = [cell for cell in remaining if len(samples[cell]) < plans[cell][1]]
+            block += 1
+
+        self.__blocks = [[blocks[(argument_index, function_index)] for function_index in range(len(functions))]
+                         for argument_index in range(len(arguments))]
+        return [[samples[(argument_index, function_index)] for function_index in range(len(functions))]
+                for argument_index in range(len(arguments))]
+
+    def get_blocks(self) -> Optional[List[List[array]]]:
+        return self.__blocks
+
+    def get_memory(self) -> None:
+        """the memory is left to be measured in this process, after the blocks."""
+        return None
@@ -0,0 +1,128 @@
+import gc
+import multiprocessing
+import multiprocessing.connection
+import os
+import traceback
+
+from array import array
+from measurement import empty_function
+from memory_usage import MemoryUsage, measure_memory, measure_rss
+from performance_types import Runner, TimedArgument, Timer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class IsolatedRunner(Runner):
+    """runner measuring every function with every argument in a fresh process of its own, forked from this one,
+    so that no function warms the caches or the allocator up for another and their garbage stays apart.
+    up to the given number of processes run at once, each of them possibly pinned to a cpu of its own.
+
+    where processes cannot be forked they are spawned, the functions and arguments having to be picklable then.
+    measuring the memory, the growth of the resident set during the first call of a function in its process
+    is measured too."""
+
+    def __init__(self, processes: Optional[int] = None, warmup: int = 1, disable_gc: bool = False,
+                 cpus: Optional[Sequence[int]] = None) -> None:
+        """
+        :param processes: number of processes measuring at once, by default the number of cpus given or available
+        :param warmup: number of batches of calls measured and discarded before the measurement
+        :param disable_gc: whether the garbage collector is disabled during the measurement
+        :param cpus: cpus the processes are pinned to in turn, where the platform allows it
+        """
+        self.cpus: Optional[List[int]] = list(cpus) if cpus else None
+        self.processes: int = processes or (len(self.cpus) if self.cpus else os.cpu_count() or 1)
+        self.warmup: int = warmup
+        self.disable_gc: bool = disable_gc
+        methods: List[str] = multiprocessing.get_all_start_methods()
+        self.__context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        self.__memory: Optional[List[List[MemoryUsage]]] = None
+
+    def run(self, functions: Sequence[Callable], arguments: Sequence[TimedArgument], count: Optional[int],
+            timer: Timer, memory: bool = False) -> List[List[array]]:
+        cells: List[Tuple[int, int]] = [(argument_index, function_index) for argument_index in range(len(arguments))
+                                        for function_index in range(len(functions))]
+        samples: Dict[Tuple[int, int], array] = {}
+        usages: Dict[Tuple[int, int], Optional[MemoryUsage]] = {}
+        running: Dict[Any, Tuple[Tuple[int, int], Any]] = {}
+
+        try:
+            for position, cell in enumerate(cells):
+                if len(running) == self.processes:
+                    self.__collect(running, samples, usages)
+                receiver, sender = self.__context.Pipe(duplex=False)
+                cpu: Optional[int] = self.cpus[position % len(self.cpus)] if self.cpus else None
+                process = self.__context.Process(target=_measure_cell, args=(
+                    sender, functions[cell[1]], arguments[cell[0]], count, timer, self.warmup, self.disable_gc, cpu,
+                    memory
+                ))
+                process.start()
+                sender.close()
+                running[receiver] = (cell, process)
+            while running:
+                self.__collect(running, samples, usages)
+        except BaseException:
+            self.__abandon(running)
+            raise
+
+        self.__memory = [[usages[(argument_index, function_index)] for function_index in range(len(functions))]
+                         for argument_index in range(len(arguments))] if memory else None
+        return [[samples[(argument_index, function_index)] for function_index in range(len(functions))]
+                for argument_index in range(len(arguments))]
+
+    def get_blocks(self) -> None:
+        return None
+
+    def get_memory(self) -> Optional[List[List[MemoryUsage]]]:
+        return self.__memory
+
+    @staticmethod
+    def __abandon(running: Dict[Any, Tuple[Tuple[int, int], Any]]) -> None:
+        """terminates the processes still measuring, once a measurement has failed."""
+        for receiver, (_, process) in running.items():
+            process.terminate()
+            receiver.close()
+            process.join()
+        running.clear()
+
+    @staticmethod
+    def __collect(running: Dict[Any, Tuple[Tuple[int, int], Any]], samples: Dict[Tuple[int, int], array],
+                  usages: Dict[Tuple[int, int], Optional[MemoryUsage]]) -> None:
+        for receiver in multiprocessing.connection.wait(list(running)):
+            cell, process = running.pop(receiver)
+            try:
+                outcome, result = receiver.recv()
+            except EOFError:
+                outcome, result = 'error', f'the measuring process exited with {process.exitcode}'
+            finally:
+                receiver.close()
+                process.join()
+            if outcome == 'error':
+                raise RuntimeError(f'measuring function {cell[1]} with argument {cell[0]} failed:\n{result}')
+            samples[cell], usages[cell] = result
+
+
+def _measure_cell(sender, function: Callable, argument: TimedArgument, count: Optional[int], timer: Timer,
+                  warmup: int, disable_gc: bool, cpu: Optional[int], memory: bool) -> None:
+    try:
+        if cpu is not None and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, {cpu})
+        call: Callable[[], Any] = argument.bind(function)
+        # before anything else runs in the process, so that the first call tells the growth of the resident set
+        rss: Optional[int] = measure_rss(call) if memory else None
+        overhead: float = timer.calibrate(argument.bind(empty_function))
+        batch, repeat = timer.plan(call, count)
+        for _ in range(warmup):
+            timer.sample(call, overhead, batch)
+
+        if disable_gc:
+            gc.collect()
+            gc.disable()
+        try:
+            samples: array = array('d', timer.measure_planned(call, overhead, batch, repeat))
+        finally:
+            gc.enable()
+        usage: Optional[MemoryUsage] = measure_memory(call).with_rss(rss) if memory else None
+        sender.send(('samples', (samples, usage)))
+    except BaseException:
+        sender.send(('error', traceback.format_exc()))
+    finally:
+        sender.close()
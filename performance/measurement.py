@@ -1,54 +1,183 @@
-import itertools
+import math
+import statistics
 
-from performance_types import Measurement, Printer
-from typing import Callable, List, Any, Sequence
+from array import array
+from memory_usage import MemoryUsage, measure_memory
+from performance_types import Measurement, Printer, TimedArgument, Timer
+from sample_statistics import SampleStatistics, is_significantly_slower
+from timer import BatchTimer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+def empty_function(argument: Any = None) -> None:
+    """called to calibrate the overhead of calling the functions measured."""
+    pass
 
 
 class PerformanceMeasurement(Measurement):
-    def __init__(self, functions: Sequence[Callable], argument: Any, count: int) -> None:
+    def __init__(self, functions: Sequence[Callable], argument: TimedArgument, count: Optional[int] = None,
+                 timer: Optional[Timer] = None, early_stopping: bool = False, confidence: float = .95,
+                 samples: Optional[Sequence[Sequence[float]]] = None,
+                 blocks: Optional[Sequence[Sequence[int]]] = None, memory: bool = False,
+                 memory_usage: Optional[Sequence[MemoryUsage]] = None) -> None:
+        """
+        :param count: number of calls of every function, chosen by the timer if not given
+        :param early_stopping: whether to stop measuring once the ordering of the functions is significant,
+            the functions being measured in rounds of a batch each then
+        :param confidence: level of the confidence intervals telling the significance of the differences
+        :param samples: samples of every function measured elsewhere, e.g. by a Runner, nothing being measured then
+        :param blocks: blocks the samples were measured in, the functions being ranked and compared by the medians
+            of the ratios within blocks then
+        :param memory: whether to measure the memory taken by a single call of every function too, after the timing
+        :param memory_usage: memory taken by every function measured elsewhere, e.g. by a Runner
+        """
         self.__funcs: Sequence[Callable] = functions
-        self.__count: int = count
-        self.__arg: Any = argument
+        self.__count: Optional[int] = count
+        self.__arg: TimedArgument = argument
+        self.__timer: Timer = timer or BatchTimer()
+        self.__confidence: float = confidence
 
-        self.__results: List[float] = self.__do_measurements()
+        self.__samples: List[array] = [array('d', function_samples) for function_samples in samples] \
+            if samples is not None else self.__do_measurements(early_stopping)
+        self.__blocks: Optional[List[array]] = [array('l', function_blocks) for function_blocks in blocks] \
+            if blocks is not None else None
+        self.__statistics: List[SampleStatistics] = [SampleStatistics(samples) for samples in self.__samples]
+        self.__results: List[float] = [function_statistics.mean for function_statistics in self.__statistics]
+        self.__ranking: List[float] = self.__results if self.__blocks is None else self.__compute_block_scores()
         self.__percent_ratios: List[float] = self.__compute_ratios_to_the_fastest()
+        self.__significance: List[Optional[bool]] = self.__compute_significance()
+        self.__memory: Optional[List[MemoryUsage]] = list(memory_usage) if memory_usage is not None else None
+        if memory and self.__memory is None:
+            self.__memory = [measure_memory(self.__arg.bind(f)) for f in self.__funcs]
 
-    def __do_measurements(self) -> List[float]:
-        return [self.__measure_single(f) for f in self.__funcs]
+    def __do_measurements(self, early_stopping: bool) -> List[array]:
+        overhead: float = self.__timer.calibrate(self.__arg.bind(empty_function))
+        calls: List[Callable[[], Any]] = [self.__arg.bind(f) for f in self.__funcs]
+        plans: List[Tuple[int, int]] = [self.__timer.plan(call, self.__count) for call in calls]
+        if early_stopping:
+            return self.__measure_in_rounds(calls, plans, overhead)
+        return [array('d', self.__timer.measure_planned(call, overhead, *plan)) for call, plan in zip(calls, plans)]
 
-    def __measure_single(self, f: Callable) -> float:
-        elapsed: int = 0
-        for _ in itertools.repeat(None, self.__count):
-            elapsed += self.__arg.apply(f)
+    def __measure_in_rounds(self, calls: Sequence[Callable[[], Any]], plans: Sequence[Tuple[int, int]],
+                            overhead: float, check_every: int = 5) -> List[array]:
+        samples: List[array] = [array('d') for _ in calls]
+        for round_number in range(1, max(repeat for _, repeat in plans) + 1):
+            for call, (batch, repeat), call_samples in zip(calls, plans, samples):
+                if round_number <= repeat:
+                    call_samples.append(self.__timer.sample(call, overhead, batch))
+            if round_number % check_every == 0 and self.__is_ordering_settled(samples):
+                break
+        return samples
 
-        return elapsed/self.__count
+    def __is_ordering_settled(self, samples: Sequence[array]) -> bool:
+        ordered: List[SampleStatistics] = sorted(map(SampleStatistics, samples), key=lambda function_statistics: function_statistics.mean)
+        return all(is_significantly_slower(slower, faster, self.__confidence, resamples=200)
+                   for faster, slower in zip(ordered, ordered[1:]))
 
     def __compute_ratios_to_the_fastest(self) -> List[float]:
-        least_result: float = min(self.__results)
-        return [result/least_result*100 - 100 for result in self.__results]
+        least: float = min(value for value in self.__ranking if not math.isnan(value))
+        if not least:
+            # the fastest function too fast to be told from the overhead of calling it, the others unresolved
+            return [0. if not value else math.nan for value in self.__ranking]
+        return [value/least*100 - 100 for value in self.__ranking]
+
+    def __compute_block_scores(self) -> List[float]:
+        """medians of the ratios of the samples to the ones of a reference function measured in the same blocks,
+        so that a drift between the blocks cancels out. the functions are ranked and compared by them,
+        the ranking agreeing with the ratios then."""
+        reference: int = min(range(len(self.__results)), key=self.__results.__getitem__)
+        reference_samples: Dict[int, float] = dict(zip(self.__blocks[reference], self.__samples[reference]))
+        scores: List[float] = []
+        for index, (samples, blocks) in enumerate(zip(self.__samples, self.__blocks)):
+            block_ratios: List[float] = [sample / reference_samples[block] for sample, block in zip(samples, blocks)
+                                         if reference_samples.get(block)]
+            if index == reference:
+                scores.append(1.)
+            elif block_ratios:
+                scores.append(statistics.median(block_ratios))
+            else:
+                scores.append(math.nan)
+        return scores
+
+    def __compute_significance(self) -> List[Optional[bool]]:
+        fastest: SampleStatistics = self.__statistics[self.get_indices_sorted_by_timings()[0]]
+        return [False if function_statistics is fastest
+                else is_significantly_slower(function_statistics, fastest, self.__confidence)
+                for function_statistics in self.__statistics]
 
     def get_indices_sorted_by_timings(self) -> List[int]:
         return list(map(
             lambda index_with_result: index_with_result[0],
-            sorted(enumerate(self.__results), key=lambda x: x[1])
+            sorted(enumerate(self.__ranking), key=lambda x: math.inf if math.isnan(x[1]) else x[1])
         ))
 
+    def get_results(self) -> List[float]:
+        return list(self.__results)
+
+    def get_ratios(self) -> List[float]:
+        """percents every function took longer than the fastest one."""
+        return list(self.__percent_ratios)
+
+    def get_samples(self) -> List[array]:
+        """seconds taken by a single call in every batch measured, for every function."""
+        return list(self.__samples)
+
+    def get_blocks(self) -> Optional[List[array]]:
+        """blocks every sample was measured in, if measured in blocks."""
+        return list(self.__blocks) if self.__blocks is not None else None
+
+    def get_statistics(self) -> List[SampleStatistics]:
+        return list(self.__statistics)
+
+    def get_significance(self) -> List[Optional[bool]]:
+        """whether every function is significantly slower than the fastest one, None where it cannot be told."""
+        return list(self.__significance)
+
+    def get_memory(self) -> Optional[List[MemoryUsage]]:
+        """memory taken by a single call of every function, if measured."""
+        return list(self.__memory) if self.__memory is not None else None
+
     def sort(self, order: Sequence[int]) -> None:
         self.__results: Sequence[float] = [self.__results[i] for i in order]
+        self.__ranking: Sequence[float] = [self.__ranking[i] for i in order]
         self.__percent_ratios: Sequence[float] = [self.__percent_ratios[i] for i in order]
+        self.__samples: List[array] = [self.__samples[i] for i in order]
+        if self.__blocks is not None:
+            self.__blocks: List[array] = [self.__blocks[i] for i in order]
+        self.__statistics: List[SampleStatistics] = [self.__statistics[i] for i in order]
+        self.__significance: List[Optional[bool]] = [self.__significance[i] for i in order]
+        if self.__memory is not None:
+            self.__memory: List[MemoryUsage] = [self.__memory[i] for i in order]
 
     def print(self, printer: Printer) -> None:
-        for result, ratio in zip(self.__results, self.__percent_ratios):
-            self.__print_single_result_with_ratio(printer, result, ratio)
+        for index, (result, ratio, significant) in enumerate(zip(self.__results, self.__percent_ratios,
+                                                                 self.__significance)):
+            self.__print_single_result_with_ratio(printer, result, ratio, significant)
+            if self.__memory is not None:
+                self.__print_memory_usage(printer, self.__memory[index])
         self.__print_argument_name()
 
     @staticmethod
-    def __print_single_result_with_ratio(printer: Printer, result: float, ratio: float):
+    def __print_single_result_with_ratio(printer: Printer, result: float, ratio: float,
+                                         significant: Optional[bool]):
         print(printer.get_single_measurement_format().format(result), end='')
-        if abs(ratio) > 1e-5:
+        if math.isnan(ratio):
+            print(printer.get_unresolved_ratio_format().format(ratio), end='')
+        elif abs(ratio) <= 1e-5:
+            print(printer.get_trivial_ratio_format().format(ratio), end='')
+        elif significant:
             print(printer.get_nontrivial_ratio_format().format(ratio), end='')
+        elif significant is None:
+            print(printer.get_unknown_ratio_format().format(ratio), end='')
         else:
-            print(printer.get_trivial_ratio_format().format(ratio), end='')
+            print(printer.get_insignificant_ratio_format().format(ratio), end='')
+
+    @staticmethod
+    def __print_memory_usage(printer: Printer, usage: MemoryUsage) -> None:
+        print(printer.get_memory_format().format(
+            printer.format_size(usage.peak), printer.format_size(usage.net), usage.blocks,
+            printer.format_size(usage.rss)
+        ), end='')
 
     def __print_argument_name(self) -> None:
         self.__arg.print()
@@ -0,0 +1,92 @@
+import gc
+import sys
+import tracemalloc
+
+from typing import Any, Callable, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class MemoryUsage:
+    """memory taken by a single call, as traced by tracemalloc, and the growth of the resident set of the process
+    where it was measured in a fresh process."""
+
+    def __init__(self, peak: int, net: int, blocks: int, rss: Optional[int] = None) -> None:
+        """
+        :param peak: bytes allocated at the peak of the call, over the ones allocated before it
+        :param net: bytes allocated by the call and still held after it, including by its result
+        :param blocks: number of memory blocks allocated by the call and still held after it
+        :param rss: bytes the peak resident set size of the process grew by during the first call, if measured
+        """
+        self.peak: int = peak
+        self.net: int = net
+        self.blocks: int = blocks
+        self.rss: Optional[int] = rss
+
+    def with_rss(self, rss: Optional[int]) -> 'MemoryUsage':
+        return MemoryUsage(self.peak, self.net, self.blocks, rss)
+
+    def __repr__(self) -> str:
+        return f'MemoryUsage(peak={self.peak}, net={self.net}, blocks={self.blocks}, rss={self.rss})'
+
+
+def measure_memory(call: Callable[[], Any]) -> MemoryUsage:
+    """traces the allocations of a single call, its result being held until they are counted."""
+    tracing: bool = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        # a vacuous call first, so that the counting of the blocks settles
+        _trace(_vacuous)
+        return _trace(call)
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+
+def measure_rss(call: Callable[[], Any]) -> Optional[int]:
+    """
+    :return: bytes the peak resident set size of the process grew by during the call,
+        None where the platform does not tell it; only meaningful as the first call of a fresh process
+    """
+    before: Optional[int] = peak_rss()
+    call()
+    after: Optional[int] = peak_rss()
+    return after - before if before is not None and after is not None else None
+
+
+def peak_rss() -> Optional[int]:
+    """
+    :return: peak resident set size of this process in bytes, None where the platform does not tell it
+    """
+    if resource is None:
+        return None
+    maximum: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in kilobytes but on macos
+    return maximum if sys.platform == 'darwin' else maximum * 1024
+
+
+def _trace(call: Callable[[], Any]) -> MemoryUsage:
+    gc.collect()
+    blocks_before: int = _count_traced_blocks()
+    tracemalloc.reset_peak()
+    before: int = tracemalloc.get_traced_memory()[0]
+    result: Any = call()
+    after, peak = tracemalloc.get_traced_memory()
+    blocks_after: int = _count_traced_blocks()
+    del result
+    return MemoryUsage(peak - before, after - before, blocks_after - blocks_before)
+
+
+def _vacuous() -> None:
+    pass
+
+
+def _count_traced_blocks() -> int:
+    # leaving out the blocks of the snapshots and of the measurement itself
+    return len(tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)
+    ]).traces)
@@ -1,6 +1,6 @@
 import abc
 
-from typing import Callable, List, Any, Sequence
+from typing import Callable, List, Any, Optional, Sequence, Tuple
 
 
 class TimedArgument(metaclass=abc.ABCMeta):
@@ -8,6 +8,10 @@ class TimedArgument(metaclass=abc.ABCMeta):
     def apply(self, f: Callable) -> float:
         pass
 
+    @abc.abstractmethod
+    def bind(self, f: Callable) -> Callable[[], Any]:
+        pass
+
     @abc.abstractmethod
     def print(self) -> None:
         pass
@@ -17,11 +21,101 @@ class TimedArgument(metaclass=abc.ABCMeta):
         pass
 
 
+class Timer(metaclass=abc.ABCMeta):
+    @abc.abstractmethod
+    def calibrate(self, empty_call: Callable[[], Any]) -> float:
+        """
+        :return: overhead of a single call in nanoseconds
+        """
+        pass
+
+    @abc.abstractmethod
+    def plan(self, call: Callable[[], Any], count: Optional[int] = None) -> Tuple[int, int]:
+        """
+        :param count: number of calls measured, chosen by the timer if not given
+        :return: size of the batches of calls and their number
+        """
+        pass
+
+    @abc.abstractmethod
+    def sample(self, call: Callable[[], Any], overhead: float, batch: int) -> float:
+        """
+        :return: seconds taken by a single call, measured over a batch of calls
+        """
+        pass
+
+    @abc.abstractmethod
+    def measure(self, call: Callable[[], Any], overhead: float, count: Optional[int] = None) -> List[float]:
+        """
+        :param count: number of calls measured, chosen by the timer if not given
+        :return: seconds taken by a single call, one sample for every batch of calls
+        """
+        pass
+
+    @abc.abstractmethod
+    def measure_planned(self, call: Callable[[], Any], overhead: float, batch: int, repeat: int) -> List[float]:
+        pass
+
+
+class Runner(metaclass=abc.ABCMeta):
+    @abc.abstractmethod
+    def run(self, functions: Sequence[Callable], arguments: Sequence[TimedArgument], count: Optional[int],
+            timer: Timer, memory: bool = False) -> List[List[Sequence[float]]]:
+        """
+        :param memory: whether to measure the memory taken by a single call too, where the runner can
+        :return: samples of every function, as measured by the timer, one row for every argument
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_blocks(self) -> Optional[List[List[Sequence[int]]]]:
+        """
+        :return: blocks the samples of the last run were measured in, in the shape of the samples, if run in blocks
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_memory(self) -> Optional[List[List[Any]]]:
+        """
+        :return: memory taken by every function with every argument in the last run, in the shape of the samples,
+            if measured by the runner
+        """
+        pass
+
+
 class Measurement(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def get_indices_sorted_by_timings(self) -> List[int]:
         pass
 
+    @abc.abstractmethod
+    def get_results(self) -> List[float]:
+        pass
+
+    @abc.abstractmethod
+    def get_ratios(self) -> List[float]:
+        pass
+
+    @abc.abstractmethod
+    def get_samples(self) -> List[Sequence[float]]:
+        pass
+
+    @abc.abstractmethod
+    def get_blocks(self) -> Optional[List[Sequence[int]]]:
+        pass
+
+    @abc.abstractmethod
+    def get_statistics(self) -> List[Any]:
+        pass
+
+    @abc.abstractmethod
+    def get_memory(self) -> Optional[List[Any]]:
+        pass
+
+    @abc.abstractmethod
+    def get_significance(self) -> List[Optional[bool]]:
+        pass
+
     @abc.abstractmethod
     def sort(self, order: Sequence[int]) -> None:
         pass
@@ -52,6 +146,26 @@ class Printer(metaclass=abc.ABCMeta):
     def get_trivial_ratio_format(self) -> str:
         pass
 
+    @abc.abstractmethod
+    def get_insignificant_ratio_format(self) -> str:
+        pass
+
+    @abc.abstractmethod
+    def get_unknown_ratio_format(self) -> str:
+        pass
+
+    @abc.abstractmethod
+    def get_unresolved_ratio_format(self) -> str:
+        pass
+
+    @abc.abstractmethod
+    def get_memory_format(self) -> str:
+        pass
+
+    @abc.abstractmethod
+    def format_size(self, size: Optional[int]) -> str:
+        pass
+
 
 class Comparator(metaclass=abc.ABCMeta):
     @abc.abstractmethod
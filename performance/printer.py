@@ -1,14 +1,20 @@
 import functools
 
 from performance_types import Printer, Measurement
-from typing import Callable, Any, Sequence
+from typing import Callable, Any, Optional, Sequence
 
 
 class PerformancePrinter(Printer):
     column_width: int = 20
+    memory_column_width: int = 35
 
-    def __init__(self) -> None:
+    def __init__(self, memory: bool = False) -> None:
+        """
+        :param memory: whether every function column is followed by the peak, net and resident memory of a call
+            and the number of blocks it allocated
+        """
         self.column_width += self.column_width % 4
+        self.memory: bool = memory
 
     def print_header(self, functions: Sequence[Callable], arguments: Sequence[Any]) -> int:
         function_descriptions_length: int = self.__print_function_descriptions(functions)
@@ -26,11 +32,17 @@ class PerformancePrinter(Printer):
         return len(header)
 
     def __get_formatted_function_description(self, function: Callable) -> str:
-        return self.__get_function_description_format().format(self.__get_function_description(function))
+        description: str = self.__get_function_description_format().format(self.__get_function_description(function))
+        if self.memory:
+            description += self.__get_memory_description_format().format('peak / net / blocks / rss')
+        return description
 
     def __get_function_description_format(self) -> str:
         return ' {0:^' + str(self.column_width) + '} |'
 
+    def __get_memory_description_format(self) -> str:
+        return ' {0:^' + str(self.memory_column_width) + '} |'
+
     def __get_function_description(self, f: Callable) -> str:
         return f.__doc__[:self.column_width] if f.__doc__ else f.__name__[:self.column_width]
 
@@ -55,3 +67,30 @@ class PerformancePrinter(Printer):
 
     def get_trivial_ratio_format(self) -> str:
         return ' ' * (self.column_width//4) + '-' + ' ' * (self.column_width//4) + '|'
+
+    def get_insignificant_ratio_format(self) -> str:
+        """ratio marked as being within the noise."""
+        return ' ~{0:+' + str((self.column_width//2)-3) + '.2f}% |'
+
+    def get_unknown_ratio_format(self) -> str:
+        """ratio whose significance cannot be told, too few batches having been measured."""
+        return ' ?{0:+' + str((self.column_width//2)-3) + '.2f}% |'
+
+    def get_unresolved_ratio_format(self) -> str:
+        """ratio to a fastest function too fast to be timed."""
+        return ' ' * (self.column_width//4) + '?' + ' ' * (self.column_width//4) + '|'
+
+    def get_memory_format(self) -> str:
+        """peak and net memory of a call, formatted by format_size, the number of blocks it allocated
+        and its resident memory, formatted by format_size."""
+        width: str = str((self.memory_column_width - 3) // 4)
+        return ' {0:>' + width + '} {1:>' + width + '} {2:>' + width + '} {3:>' + width + '} |'
+
+    def format_size(self, size: Optional[int]) -> str:
+        if size is None:
+            return '-'
+        for unit in ('B', 'kB', 'MB'):
+            if abs(size) < 1024:
+                return f'{size:.0f}{unit}' if unit == 'B' else f'{size:.1f}{unit}'
+            size /= 1024
+        return f'{size:.1f}GB'
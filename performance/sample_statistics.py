@@ -0,0 +1,77 @@
+import math
+import random
+import statistics
+
+from array import array
+from typing import Optional, Sequence, Tuple
+
+
+class SampleStatistics:
+    """statistics of the samples of a measurement, the seconds taken by a single call.
+    the outliers, samples beyond the Tukey fences, are rejected from the mean, the deviation and the intervals."""
+
+    def __init__(self, samples: Sequence[float], outlier_factor: float = 1.5) -> None:
+        """
+        :param outlier_factor: multiple of the interquartile range the fences are placed at off the quartiles
+        """
+        self.samples: array = array('d', samples)
+        if len(self.samples) > 1:
+            self.first_quartile, self.median, self.third_quartile = statistics.quantiles(self.samples, n=4)
+        else:
+            self.first_quartile = self.median = self.third_quartile = self.samples[0]
+        self.iqr: float = self.third_quartile - self.first_quartile
+
+        low: float = self.first_quartile - outlier_factor * self.iqr
+        high: float = self.third_quartile + outlier_factor * self.iqr
+        self.kept: array = array('d', (sample for sample in self.samples if low <= sample <= high))
+
+    @property
+    def minimum(self) -> float:
+        return min(self.samples)
+
+    @property
+    def outliers(self) -> int:
+        return len(self.samples) - len(self.kept)
+
+    @property
+    def mean(self) -> float:
+        return statistics.fmean(self.kept)
+
+    @property
+    def stddev(self) -> float:
+        return statistics.stdev(self.kept) if len(self.kept) > 1 else 0.
+
+    def bootstrap_interval(self, confidence: float = .95, resamples: int = 1000, seed: int = 0) -> Tuple[float, float]:
+        """:return: confidence interval of the mean, by the percentile bootstrap"""
+        generator: random.Random = random.Random(seed)
+        means = sorted(statistics.fmean(generator.choices(self.kept, k=len(self.kept))) for _ in range(resamples))
+        return _percentile_interval(means, confidence)
+
+
+def bootstrap_ratio_interval(slower: SampleStatistics, faster: SampleStatistics, confidence: float = .95,
+                             resamples: int = 1000, seed: int = 0) -> Tuple[float, float]:
+    """:return: confidence interval of the ratio of the means of the slower and the faster samples"""
+    generator: random.Random = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        faster_mean: float = statistics.fmean(generator.choices(faster.kept, k=len(faster.kept)))
+        slower_mean: float = statistics.fmean(generator.choices(slower.kept, k=len(slower.kept)))
+        ratios.append(slower_mean / faster_mean if faster_mean else float('inf'))
+    return _percentile_interval(sorted(ratios), confidence)
+
+
+def is_significantly_slower(slower: SampleStatistics, faster: SampleStatistics, confidence: float = .95,
+                            resamples: int = 1000) -> Optional[bool]:
+    """whether the whole confidence interval of the ratio of the means lies above one,
+    None where either of them has fewer than two samples kept to tell the noise by
+    or a mean not telling a ratio, being zero or not finite."""
+    if len(slower.kept) < 2 or len(faster.kept) < 2:
+        return None
+    if not all(0 < mean < math.inf for mean in (slower.mean, faster.mean)):
+        return None
+    return bootstrap_ratio_interval(slower, faster, confidence, resamples)[0] > 1
+
+
+def _percentile_interval(values: Sequence[float], confidence: float) -> Tuple[float, float]:
+    tail: float = (1 - confidence) / 2
+    return values[int(tail * (len(values) - 1))], values[round((1 - tail) * (len(values) - 1))]
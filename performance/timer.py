@@ -0,0 +1,68 @@
+import itertools
+import math
+import time
+
+from performance_types import Timer
+from typing import Callable, Any, List, Optional, Tuple
+
+
+class BatchTimer(Timer):
+    """timer measuring batches of calls with perf_counter_ns, so that the resolution of the clock and the overhead
+    of reading it are spread over many calls. the overhead of the loop and of calling itself is calibrated
+    on an empty call and subtracted, down to the resolution of the clock: a batch taking no longer than the empty
+    calls is reported as taking that resolution, the function being too fast to tell apart. the size of the batches is chosen the way timeit.autorange does,
+    their number so that the measurement of a function takes about the target time."""
+
+    def __init__(self, target_time: float = 0.2, minimal_batch_time: float = 0.02, minimal_repeat: int = 5) -> None:
+        """
+        :param target_time: seconds a measurement of a function with an argument should take
+        :param minimal_batch_time: seconds a single batch has to take at least
+        :param minimal_repeat: number of batches measured at least, as far as a given count of calls allows
+        """
+        self.target_time: float = target_time
+        self.minimal_batch_time: float = minimal_batch_time
+        self.minimal_repeat: int = minimal_repeat
+        self.resolution: float = max(time.get_clock_info('perf_counter').resolution * 1e9, 1.)
+
+    def calibrate(self, empty_call: Callable[[], Any]) -> float:
+        batch: int = self.autorange(empty_call)
+        return min(self.time_batch(empty_call, batch) for _ in range(self.minimal_repeat)) / batch
+
+    def autorange(self, call: Callable[[], Any]) -> int:
+        """:return: the smallest batch size of 1, 2, 5, 10, 20, 50... taking at least the minimal batch time"""
+        for batch in self.__batch_sizes():
+            if self.time_batch(call, batch) >= self.minimal_batch_time * 1e9:
+                return batch
+
+    @staticmethod
+    def __batch_sizes():
+        for exponent in itertools.count():
+            for base in (1, 2, 5):
+                yield base * 10**exponent
+
+    @staticmethod
+    def time_batch(call: Callable[[], Any], batch: int) -> int:
+        """:return: nanoseconds taken by calling the callable the given number of times"""
+        repeat = itertools.repeat(None, batch)
+        start: int = time.perf_counter_ns()
+        for _ in repeat:
+            call()
+        return time.perf_counter_ns() - start
+
+    def plan(self, call: Callable[[], Any], count: Optional[int] = None) -> Tuple[int, int]:
+        batch: int = self.autorange(call)
+        if count is None:
+            batch_time: float = self.time_batch(call, batch) / 1e9
+            return batch, max(self.minimal_repeat, math.ceil(self.target_time / batch_time))
+        # split into the minimal number of batches at least, so that there are samples to tell the noise by
+        batch = min(batch, max(1, count // self.minimal_repeat))
+        return batch, math.ceil(count / batch)
+
+    def sample(self, call: Callable[[], Any], overhead: float, batch: int) -> float:
+        return max(self.time_batch(call, batch) - overhead * batch, self.resolution) / batch / 1e9
+
+    def measure(self, call: Callable[[], Any], overhead: float, count: Optional[int] = None) -> List[float]:
+        return self.measure_planned(call, overhead, *self.plan(call, count))
+
+    def measure_planned(self, call: Callable[[], Any], overhead: float, batch: int, repeat: int) -> List[float]:
+        return [self.sample(call, overhead, batch) for _ in range(repeat)]
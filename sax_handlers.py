@@ -4,37 +4,67 @@ have to inherit from ContentHandler, DTDHandler, EntityResolver or ErrorHandler.
 to be passed e.g. to xml.sax.parseString method
 the outcome will be stored within the handler."""
 
+import abc
+import array
+import bz2
+import collections
+import concurrent.futures
+import functools
+import gzip
+import io
+import itertools
+import json
+import logging
+import lzma
+import mmap
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
 import xml.sax
+import zipfile
+
+
+def _vacuous(*args):
+    pass
 
 
 class SingleTagHandler(xml.sax.handler.ContentHandler):
     """handler extracting the content from a single xml tag.
     without explicit clearing the content from multiple tags is concatenated."""
 
-    # TODO write new handler based on DOM-tree
     # TODO extend the below one to make parent optional then this one is redundant
     def __init__(self, tagname):
         super().__init__()
 
         self.__content = ''
-        self.__current_tag = None
-        self.__tagname = tagname
+        self.__tagname = sys.intern(tagname)
+        # the text of the tag comes in many fragments, these are joined once the tag ends
+        self.__fragments = []
+        self.__current_fragments = None
 
     def startElement(self, name, attrs):
-        self.__current_tag = name
+        self.__current_fragments = self.__fragments if name == self.__tagname else None
 
     def endElement(self, name):
-        self.__current_tag = None
+        self.__current_fragments = None
+        if self.__fragments:
+            self.__content += ''.join(self.__fragments)
+            self.__fragments.clear()
 
     def characters(self, content):
-        if self.__current_tag == self.__tagname:
-            self.__content += content
+        if self.__current_fragments is not None:
+            self.__current_fragments.append(content)
 
     def clear_content(self):
         self.__content = ''
+        self.__fragments.clear()
 
     def get_parsed(self):
-        return self.__content
+        return self.__content + ''.join(self.__fragments)
 
 
 class SingleTagChildrenHandler(xml.sax.handler.ContentHandler):
@@ -44,61 +74,1295 @@ class SingleTagChildrenHandler(xml.sax.handler.ContentHandler):
 
     def __init__(self, parent_tag, children_tags, callbacks):
         """
-        :param callbacks: a dict with the following keys:
+        :param callbacks: a dict with the following keys, the missing ones doing nothing:
             - child_start(handler, tagname, attributes)
             - child_end(handler, tagname)
-            - parent_start(handler, tagname, attributes)
+            - parent_start(handler, attributes)
             - parent_end(handler, tagname)
         """
         super().__init__()
 
-        self.__parent = parent_tag
-        self.__children = children_tags
+        self.__parent = sys.intern(parent_tag)
+        self.__children = frozenset(sys.intern(child_tag) for child_tag in children_tags)
 
-        # TODO vacuous functions rather than None
-        self.__child_start_callback = callbacks.get('child_start', None)
-        self.__child_end_callback = callbacks.get('child_end', None)
-        self.__parent_start_callback = callbacks.get('parent_start', None)
-        self.__parent_end_callback = callbacks.get('parent_end', None)
+        self.__child_start_callback = callbacks.get('child_start', _vacuous)
+        self.__child_end_callback = callbacks.get('child_end', _vacuous)
+        self.__parent_start_callback = callbacks.get('parent_start', _vacuous)
+        self.__parent_end_callback = callbacks.get('parent_end', _vacuous)
 
-        self.__current_tag = None
-        self.__current_parent_tag = None
-        self.__content = {child_tag: '' for child_tag in children_tags}
+        # what to do on the start and the end of every tag of interest, other tags only reset the current fragments
+        self.__start_actions = dict.fromkeys(self.__children, self.__start_child)
+        self.__start_actions[self.__parent] = self.__start_parent
+        self.__end_actions = dict.fromkeys(self.__children, self.__end_child)
+        self.__end_actions[self.__parent] = self.__end_parent
+
+        self.__inside_parent = False
+        self.__content = dict.fromkeys(self.__children, '')
+        self.__fragments = {child_tag: [] for child_tag in self.__children}
+        self.__current_fragments = None
 
     def startElement(self, name, attrs):
-        self.__current_tag = name
+        if name in self.__start_actions:
+            self.__start_actions[name](name, attrs)
+        else:
+            self.__current_fragments = None
+
+    def endElement(self, name):
+        self.__current_fragments = None
+        if name in self.__end_actions:
+            self.__end_actions[name](name)
 
-        if name == self.__parent:
-            self.__current_parent_tag = name
-            if self.__parent_start_callback:
-                self.__parent_start_callback(self, attrs)
+    def characters(self, content):
+        if self.__current_fragments is not None:
+            self.__current_fragments.append(content)
 
-        elif (name in self.__children and self.__current_parent_tag == self.__parent
-              and self.__child_start_callback):
-            self.__child_start_callback(self, name, attrs)
+    def __start_parent(self, name, attrs):
+        self.__current_fragments = self.__fragments.get(name)
+        self.__inside_parent = True
+        self.__parent_start_callback(self, attrs)
 
-    def endElement(self, name):
-        self.__current_tag = None
+    def __start_child(self, name, attrs):
+        self.__current_fragments = self.__fragments[name]
+        if self.__inside_parent:
+            self.__child_start_callback(self, name, attrs)
 
-        if name == self.__parent:
-            self.__current_parent_tag = None
-            if self.__parent_end_callback:
-                self.__parent_end_callback(self, name)
+    def __end_parent(self, name):
+        if name in self.__fragments:
+            self.__join_fragments(name)
+        self.__inside_parent = False
+        self.__parent_end_callback(self, name)
 
-        elif (name in self.__children and self.__current_parent_tag == self.__parent
-              and self.__child_end_callback):
+    def __end_child(self, name):
+        self.__join_fragments(name)
+        if self.__inside_parent:
             self.__child_end_callback(self, name)
 
-    def characters(self, content):
-        if self.__current_tag in self.__children:
-            self.__content[self.__current_tag] += content
+    def __join_fragments(self, name):
+        fragments = self.__fragments[name]
+        if fragments:
+            self.__content[name] += ''.join(fragments)
+            fragments.clear()
 
     def get_parsed_child(self, tagname):
-        return self.__content[tagname]
+        return self.__content[tagname] + ''.join(self.__fragments[tagname])
 
     def clear_parsed_child(self, tagname):
         self.__content[tagname] = ''
+        self.__fragments[tagname].clear()
 
     def clear_content(self):
         for child in self.__children:
             self.clear_parsed_child(child)
+
+
+class Element:
+    """compact element of a subtree, with the text before its first child and the tail after it as in ElementTree.
+    the tags are qualified names as in the document."""
+    __slots__ = ('tag', 'attributes', 'children', 'text', 'tail')
+
+    def __init__(self, tag, attributes=None):
+        self.tag = tag
+        self.attributes = attributes
+        self.children = []
+        self.text = None
+        self.tail = None
+
+    def get(self, attribute, default=None):
+        return self.attributes.get(attribute, default) if self.attributes else default
+
+    def iter(self, tag=None):
+        """yields the element and its descendants in the document order, those matching the tag if given."""
+        stack = [self]
+        while stack:
+            element = stack.pop()
+            if tag is None or _tag_matches(element.tag, tag):
+                yield element
+            stack.extend(reversed(element.children))
+
+    def itertext(self):
+        if self.text:
+            yield self.text
+        for child in self.children:
+            yield from child.itertext()
+            if child.tail:
+                yield child.tail
+
+    def text_content(self):
+        """the whole text within the element."""
+        return ''.join(self.itertext())
+
+    def findall(self, path):
+        """elements, attribute values or texts selected by the path, relative to this element.
+
+        a subset of XPath is supported: steps separated by '/' or by '//' for descendants at any depth,
+        each step being a name, with a prefix or without one matching any, '*' or '.', followed by predicates:
+        [@attribute], [@attribute='value'], [child], [child='text'] and [position] counted from 1.
+        the last step can also be @attribute, giving the values, or text(), giving the text before the first child.
+        """
+        elements = [self]
+        for axis, test, predicates in _compile_path(path):
+            if test == '.':
+                continue
+            if test.startswith('@'):
+                return [element.attributes[test[1:]] for element in elements
+                        if element.attributes and test[1:] in element.attributes]
+            if test == 'text()':
+                return [element.text or '' for element in elements]
+
+            selected = []
+            for element in elements:
+                candidates = element.children if axis == '/' else itertools.islice(element.iter(), 1, None)
+                matches = [candidate for candidate in candidates if test == '*' or _tag_matches(candidate.tag, test)]
+                for predicate in predicates:
+                    matches = predicate(matches)
+                selected.extend(matches)
+            elements = selected
+        return elements
+
+    def find(self, path):
+        return next(iter(self.findall(path)), None)
+
+    def findtext(self, path, default=None):
+        """the whole text of the first element selected by the path, or the first value selected."""
+        found = self.find(path)
+        if found is None:
+            return default
+        return found if isinstance(found, str) else found.text_content()
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __len__(self):
+        return len(self.children)
+
+    def __repr__(self):
+        return f'<Element {self.tag} at {id(self):#x}>'
+
+
+def _tag_matches(tag, name):
+    return tag == name or (':' not in name and tag.rpartition(':')[2] == name)
+
+
+_path_step = re.compile(r"""(//|/)?([^/\[\]]+)((?:\[(?:[^\]'"]|'[^']*'|"[^"]*")*\])*)""")
+_path_predicate = re.compile(r"""\[\s*(?:(\d+)|(@?[^\]=\s]+)\s*(?:=\s*(?:'([^']*)'|"([^"]*)"))?)\s*\]""")
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_path(path):
+    """:return: steps of (axis, test, predicates), the predicates being functions filtering lists of elements"""
+    if path.startswith('/'):
+        path = '.' + path
+    steps = []
+    position = 0
+    while position < len(path):
+        step = _path_step.match(path, position)
+        if not step or (position and not step.group(1)) or step.group(2) == '..':
+            raise ValueError(f'unsupported path: {path}')
+        predicates = tuple(_compile_predicate(predicate.groups())
+                           for predicate in _path_predicate.finditer(step.group(3)))
+        steps.append((step.group(1) or '/', step.group(2).strip(), predicates))
+        position = step.end()
+    return steps
+
+
+def _compile_predicate(groups):
+    index, name, single_quoted, double_quoted = groups
+    value = single_quoted if double_quoted is None else double_quoted
+    if index:
+        return lambda elements: elements[int(index) - 1:int(index)]
+    if name.startswith('@'):
+        return lambda elements: [element for element in elements
+                                 if element.get(name[1:]) is not None
+                                 and (value is None or element.get(name[1:]) == value)]
+    return lambda elements: [element for element in elements
+                             if any(_tag_matches(child.tag, name) and (value is None or child.text_content() == value)
+                                    for child in element.children)]
+
+
+class SubtreeHandler(xml.sax.handler.ContentHandler):
+    """handler building a compact tree of Elements for every tag of the given name, only while it is open,
+    so that each record can be queried as a small DOM at the memory cost of streaming.
+    tags of that name nested in a matched one are a part of its subtree."""
+
+    def __init__(self, parent_tag, on_subtree=None):
+        """
+        :param parent_tag: qualified name of the tags, or their local name matching any prefix
+        :param on_subtree: on_subtree(element) called with the root of every subtree when it ends;
+            by default the subtrees are collected and available through get_parsed.
+        """
+        super().__init__()
+
+        self.__parent = sys.intern(parent_tag)
+        self.__subtrees = []
+        self.__on_subtree = on_subtree or self.__subtrees.append
+
+        self.__open_elements = []
+        self.__fragments = []
+        # the element whose text or tail the current fragments are
+        self.__text_owner = None
+        self.__is_tail = False
+
+    def startElement(self, name, attrs):
+        if self.__open_elements:
+            self.__flush_text()
+        elif not _tag_matches(name, self.__parent):
+            return
+
+        element = Element(sys.intern(name), dict(attrs.items()) if len(attrs) else None)
+        if self.__open_elements:
+            self.__open_elements[-1].children.append(element)
+        self.__open_elements.append(element)
+        self.__text_owner, self.__is_tail = element, False
+
+    def endElement(self, name):
+        if not self.__open_elements:
+            return
+        self.__flush_text()
+
+        element = self.__open_elements.pop()
+        if self.__open_elements:
+            self.__text_owner, self.__is_tail = element, True
+        else:
+            self.__text_owner = None
+            self.__on_subtree(element)
+
+    def characters(self, content):
+        if self.__text_owner is not None:
+            self.__fragments.append(content)
+
+    def __flush_text(self):
+        if self.__fragments:
+            text = ''.join(self.__fragments)
+            if self.__is_tail:
+                self.__text_owner.tail = text
+            else:
+                self.__text_owner.text = text
+            self.__fragments.clear()
+
+    def get_parsed(self):
+        return self.__subtrees
+
+    def clear_content(self):
+        self.__subtrees.clear()
+
+
+def iter_subtrees(source, parent_tag, chunk_size=2**16, threaded=False):
+    """yields the subtrees of SubtreeHandler one by one, each being dropped once the next one is taken.
+
+    :param source: path of the document as read by open_document or a binary file object
+    """
+    pending = []
+    parser = xml.sax.make_parser()
+    parser.setContentHandler(SubtreeHandler(parent_tag, on_subtree=pending.append))
+
+    document = open_document(source, threaded=threaded) if isinstance(source, (str, os.PathLike)) else source
+    try:
+        while chunk := document.read(chunk_size):
+            parser.feed(chunk)
+            yield from pending
+            pending.clear()
+        parser.close()
+        yield from pending
+    finally:
+        if document is not source:
+            document.close()
+
+
+class RecordSpec:
+    """description of records to be extracted: the path of their parent tag and the paths of their fields.
+
+    a path consists of steps separated by '/', each step being either a local name matching any namespace,
+    a prefixed name such as 'prg-ad:miejscowosc' or a name in the Clark notation '{namespace-uri}miejscowosc'.
+    the parent path matches at any depth of the document, the field paths are relative to the parent.
+    the value of a field is the whole text within its tag."""
+
+    def __init__(self, name, parent, fields, multiple=()):
+        """
+        :param name: name the extracted records are passed with
+        :param parent: path of the tag enclosing a single record, e.g. 'PRG_PunktAdresowy'
+        :param fields: dict from field names to their paths, e.g. {'city': 'miejscowosc'},
+            or an iterable of paths also being the field names
+        :param multiple: names of the fields which can occur several times within a record,
+            all their values are collected in a list; otherwise the first value is kept.
+        """
+        self.name = name
+        self.parent = parent
+        self.fields = dict(fields) if isinstance(fields, dict) else {path: path for path in fields}
+        self.multiple = frozenset(multiple)
+
+    def empty_record(self):
+        return {field: [] if field in self.multiple else None for field in self.fields}
+
+    def to_dict(self):
+        return {'name': self.name, 'parent': self.parent, 'fields': self.fields, 'multiple': sorted(self.multiple)}
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(**spec)
+
+
+class _PathNode:
+    __slots__ = ('children', 'records', 'fields')
+    __steps = re.compile(r'(?:\{[^}]*\})?[^/]+')
+
+    def __init__(self):
+        # keyed by (namespace, local name), the namespace being None for any and a '?prefix' when not yet bound
+        self.children = {}
+        self.records = []
+        self.fields = []
+
+    def add_path(self, path):
+        node = self
+        for step in self.__steps.findall(path):
+            node = node.children.setdefault(self.__parse_step(step), _PathNode())
+        return node
+
+    @staticmethod
+    def __parse_step(step):
+        if step.startswith('{'):
+            namespace, _, local_name = step[1:].partition('}')
+            return namespace, sys.intern(local_name)
+        prefix, separator, local_name = step.rpartition(':')
+        return ('?' + prefix if separator else None), sys.intern(local_name)
+
+    def bind(self, prefix, namespace):
+        """replaces the given prefix with its namespace in all the steps below."""
+        unbound = '?' + prefix
+        for key in [key for key in self.children if key[0] == unbound]:
+            child = self.children.pop(key)
+            bound_key = (namespace, key[1])
+            if bound_key in self.children:
+                self.children[bound_key].merge(child)
+            else:
+                self.children[bound_key] = child
+        for child in self.children.values():
+            child.bind(prefix, namespace)
+
+    def merge(self, other):
+        self.records.extend(other.records)
+        self.fields.extend(other.fields)
+        for key, child in other.children.items():
+            if key in self.children:
+                self.children[key].merge(child)
+            else:
+                self.children[key] = child
+
+
+class PathRecordsHandler(xml.sax.handler.ContentHandler):
+    """handler extracting records of many kinds in a single pass, described by RecordSpecs.
+    all the paths are compiled into a single trie walked along with the open tags,
+    so that nested tags, also the ones of the same name, are told apart by their paths.
+    it works both with and without the namespaces feature of the parser;
+    prefixes used in the paths are bound by the namespaces given or else by the first declaration in the document."""
+
+    def __init__(self, specs, on_record=None, namespaces=None):
+        """
+        :param on_record: on_record(name, record) called with every record, a dict, when its parent tag ends;
+            by default the records are collected and available through get_parsed.
+        :param namespaces: dict from prefixes used in the paths to namespaces
+        """
+        super().__init__()
+
+        self.__specs = list(specs)
+        self.__root = _PathNode()
+        for index, spec in enumerate(self.__specs):
+            parent_node = self.__root.add_path(spec.parent)
+            parent_node.records.append(index)
+            for field, path in spec.fields.items():
+                parent_node.add_path(path).fields.append((index, field))
+
+        self.__bound_prefixes = set()
+        for prefix, namespace in (namespaces or {}).items():
+            self.__bind(prefix, namespace)
+
+        self.__records = {spec.name: [] for spec in self.__specs}
+        self.__on_record = on_record or (lambda name, record: self.__records[name].append(record))
+
+        # for every open tag the trie nodes it matched, the fields and the records it started
+        self.__open_nodes = [()]
+        self.__open_fields = []
+        self.__open_records = []
+        self.__buffers = []
+        self.__prefix_scopes = [(0, {'xml': 'http://www.w3.org/XML/1998/namespace'})]
+
+    def __bind(self, prefix, namespace):
+        if prefix not in self.__bound_prefixes:
+            self.__bound_prefixes.add(prefix)
+            self.__root.bind(prefix, namespace)
+
+    def startPrefixMapping(self, prefix, uri):
+        self.__bind(prefix or '', uri)
+
+    def startElementNS(self, name, qname, attrs):
+        self._start(name[0], name[1])
+
+    def endElementNS(self, name, qname):
+        self._end()
+
+    def startElement(self, name, attrs):
+        if len(attrs):
+            self.__read_prefix_declarations(attrs)
+        prefix, _, local_name = name.rpartition(':')
+        self._start(self.__resolve(prefix), local_name)
+
+    def endElement(self, name):
+        if self.__prefix_scopes[-1][0] == len(self.__open_nodes):
+            self.__prefix_scopes.pop()
+        self._end()
+
+    def __read_prefix_declarations(self, attrs):
+        declared = {}
+        for attribute in attrs.keys():
+            if attribute == 'xmlns':
+                declared[''] = attrs[attribute]
+            elif attribute.startswith('xmlns:'):
+                declared[attribute[6:]] = attrs[attribute]
+        if declared:
+            self.__prefix_scopes.append((len(self.__open_nodes) + 1, declared))
+            for prefix, namespace in declared.items():
+                self.__bind(prefix, namespace)
+
+    def __resolve(self, prefix):
+        for _, declared in reversed(self.__prefix_scopes):
+            if prefix in declared:
+                return declared[prefix]
+        return None
+
+    def _start(self, namespace, local_name):
+        matched = []
+        for node, records in itertools.chain(self.__open_nodes[-1], ((self.__root, None),)):
+            children = node.children
+            if children:
+                child = children.get((namespace, local_name))
+                if child is not None:
+                    matched.append((child, records))
+                if namespace is not None:
+                    child = children.get((None, local_name))
+                    if child is not None:
+                        matched.append((child, records))
+
+        started_records = started_fields = None
+        for position, (node, records) in enumerate(matched):
+            if node.records:
+                # the records a path passed through, by spec, their fields below being resolved against them
+                records = dict(records) if records else {}
+                started_records = started_records or []
+                for index in node.records:
+                    records[index] = self.__specs[index].empty_record()
+                    started_records.append((index, records[index]))
+                matched[position] = (node, records)
+            for index, field in node.fields:
+                buffer = []
+                self.__buffers.append(buffer)
+                started_fields = started_fields or []
+                started_fields.append((records[index], index, field, buffer))
+
+        self.__open_nodes.append(matched)
+        self.__open_fields.append(started_fields)
+        self.__open_records.append(started_records)
+
+    def _end(self):
+        self.__open_nodes.pop()
+        started_fields = self.__open_fields.pop()
+        started_records = self.__open_records.pop()
+
+        if started_fields:
+            for record, index, field, buffer in started_fields:
+                self.__release(buffer)
+                value = ''.join(buffer)
+                if field in self.__specs[index].multiple:
+                    record[field].append(value)
+                elif record[field] is None:
+                    record[field] = value
+
+        if started_records:
+            for index, record in reversed(started_records):
+                self.__on_record(self.__specs[index].name, record)
+
+    def __release(self, buffer):
+        # by identity, the buffers of a field and a field nested in it being equal as long as their text is
+        for position in range(len(self.__buffers) - 1, -1, -1):
+            if self.__buffers[position] is buffer:
+                del self.__buffers[position]
+                return
+
+    def characters(self, content):
+        for buffer in self.__buffers:
+            buffer.append(content)
+
+    def get_parsed(self, name):
+        return self.__records[name]
+
+    def clear_content(self):
+        for records in self.__records.values():
+            records.clear()
+
+
+def open_document(path, buffer_size=2**20, threaded=False):
+    """opens the document for reading bytes, decompressing it on the fly when gzip, xz or bz2 compressed.
+    a path within a zip archive, e.g. 'registry.zip/PRG_PunktyAdresowe_22.xml', opens the member,
+    while the path of the archive itself opens its only xml member.
+
+    :param buffer_size: size of the reads of the compressed file
+    :param threaded: whether to decompress in a thread ahead of the reads; decompression releasing the GIL,
+        it overlaps with the parsing then
+    :return: binary file object, to be closed
+    """
+    path = os.fspath(path)
+    if not os.path.isfile(path):
+        archive, member = _split_archive_path(path)
+        archive = zipfile.ZipFile(archive)
+        document = _ClosingReader(archive.open(member), archive)
+    else:
+        compressed = open(path, 'rb', buffering=buffer_size)
+        magic = compressed.peek(6)[:6]
+        if magic.startswith(b'\x1f\x8b'):
+            document = gzip.GzipFile(fileobj=compressed)
+        elif magic.startswith(b'\xfd7zXZ\x00'):
+            document = lzma.LZMAFile(compressed)
+        elif magic.startswith(b'BZh'):
+            document = bz2.BZ2File(compressed)
+        elif magic.startswith(b'PK\x03\x04'):
+            archive = zipfile.ZipFile(compressed)
+            members = [name for name in archive.namelist() if name.lower().endswith('.xml')]
+            if len(members) != 1:
+                compressed.close()
+                raise ValueError(f'a single xml member expected in {path}, found {members}')
+            document = archive.open(members[0])
+        else:
+            return compressed
+        # closing the decompressing files closes the ones they read
+        document = _ClosingReader(document, compressed)
+    return _ThreadedReader(document, buffer_size) if threaded else document
+
+
+def _split_archive_path(path):
+    archive = path
+    while archive and not os.path.isfile(archive):
+        parent = os.path.dirname(archive)
+        if parent == archive:
+            break
+        archive = parent
+    if not archive or not zipfile.is_zipfile(archive):
+        raise FileNotFoundError(path)
+    return archive, os.path.relpath(path, archive).replace(os.sep, '/')
+
+
+class _ClosingReader(io.RawIOBase):
+    """reads the file given, closing the other file along with it."""
+
+    def __init__(self, document, underlying):
+        super().__init__()
+        self.__document = document
+        self.__underlying = underlying
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.__document.read(size)
+
+    def readinto(self, buffer):
+        data = self.__document.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.__document.close()
+            self.__underlying.close()
+        super().close()
+
+
+class _ThreadedReader(io.RawIOBase):
+    """reads the file given in a thread, keeping a few chunks ahead of the reads."""
+
+    def __init__(self, document, chunk_size, depth=4):
+        super().__init__()
+        self.__document = document
+        self.__chunks = queue.Queue(depth)
+        self.__stopped = threading.Event()
+        self.__pending = b''
+        self.__finished = False
+        self.__thread = threading.Thread(target=self.__read_ahead, args=(chunk_size,), daemon=True)
+        self.__thread.start()
+
+    def __read_ahead(self, chunk_size):
+        try:
+            while not self.__stopped.is_set():
+                chunk = self.__document.read(chunk_size)
+                self.__put(chunk)
+                if not chunk:
+                    return
+        except Exception as error:
+            self.__put(error)
+
+    def __put(self, item):
+        while not self.__stopped.is_set():
+            try:
+                return self.__chunks.put(item, timeout=.1)
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while not self.__finished and (size < 0 or len(self.__pending) < size):
+            chunk = self.__chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            self.__finished = not chunk
+            self.__pending += chunk
+            if size >= 0 and self.__pending:
+                break
+        if size < 0 or size >= len(self.__pending):
+            data, self.__pending = self.__pending, b''
+        else:
+            data, self.__pending = self.__pending[:size], self.__pending[size:]
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.__stopped.set()
+            self.__thread.join()
+            self.__document.close()
+        super().close()
+
+
+class ParseMonitor:
+    """optional instrumentation of a parse, counting the bytes fed to the parser, the elements and the records,
+    and telling the time spent parsing from the time spent in callbacks or by the consumer of the records.
+    the metrics are reported every interval seconds and once the parse ends. bytes and time are accounted
+    per chunk and records per record, so the overhead stays negligible; without a monitor there is none."""
+
+    def __init__(self, reporter=None, interval=10.):
+        """
+        :param reporter: reporter(metrics) called with a dict of the metrics, e.g. logging_reporter(),
+            or a dict to be updated with them; by default they are only available through metrics()
+        :param interval: seconds between the reports during the parse
+        """
+        self.reporter = reporter
+        self.interval = interval
+        self.bytes = 0
+        self.elements = 0
+        self.records = 0
+        self.parse_seconds = 0.
+        self.callback_seconds = 0.
+        self.__started = None
+        self.__next_report = None
+
+    def metrics(self):
+        elapsed = time.perf_counter() - self.__started if self.__started is not None else 0.
+        return {
+            'bytes': self.bytes,
+            'elements': self.elements,
+            'records': self.records,
+            'elapsed_seconds': elapsed,
+            'parse_seconds': self.parse_seconds,
+            'callback_seconds': self.callback_seconds,
+            'bytes_per_second': self.bytes / elapsed if elapsed else 0.,
+            'elements_per_second': self.elements / elapsed if elapsed else 0.,
+            'records_per_second': self.records / elapsed if elapsed else 0.,
+        }
+
+    def report(self):
+        if isinstance(self.reporter, dict):
+            self.reporter.update(self.metrics())
+        elif self.reporter is not None:
+            self.reporter(self.metrics())
+
+    def wrap(self, callback, records=False):
+        """:return: the callback timed as one, every call counting as a record if records"""
+        def timed_callback(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                self.callback_seconds += time.perf_counter() - started
+                self.records += records
+        return timed_callback
+
+    def parse(self, source, handler, chunk_size=2**16, threaded=False):
+        """parses the document with xml.sax as xml.sax.parse does, instrumented;
+        the callbacks given to the handler can be timed by wrap.
+
+        :param source: path of the document as read by open_document or a binary file object
+        """
+        parser = xml.sax.make_parser()
+        parser.setContentHandler(handler)
+        # counted only during this parse, the handler being left as it was given afterwards
+        overridden = {method: vars(handler)[method] for method in ('startElement', 'startElementNS')
+                      if method in vars(handler)}
+        for method in ('startElement', 'startElementNS'):
+            setattr(handler, method, self._counted(getattr(handler, method)))
+        feed = self._timed(lambda chunk: parser.feed(chunk) if chunk else parser.close())
+
+        document = None
+        try:
+            document = open_document(source, threaded=threaded) if isinstance(source, (str, os.PathLike)) else source
+            while chunk := document.read(chunk_size):
+                feed(chunk)
+            feed(b'')
+        finally:
+            for method in ('startElement', 'startElementNS'):
+                if method in overridden:
+                    setattr(handler, method, overridden[method])
+                else:
+                    delattr(handler, method)
+            if document is not None and document is not source:
+                document.close()
+            self.report()
+
+    def _counted(self, start):
+        def counted_start(*args):
+            self.elements += 1
+            return start(*args)
+        return counted_start
+
+    def _timed(self, feed):
+        """:return: the feed function of a parser counting the bytes and the time spent parsing them"""
+        if self.__started is None:
+            self.__started = time.perf_counter()
+            self.__next_report = self.__started + self.interval
+
+        def timed_feed(chunk):
+            started = time.perf_counter()
+            callback_seconds = self.callback_seconds
+            feed(chunk)
+            finished = time.perf_counter()
+            self.parse_seconds += finished - started - (self.callback_seconds - callback_seconds)
+            self.bytes += len(chunk)
+            if finished >= self.__next_report:
+                self.__next_report = finished + self.interval
+                self.report()
+        return timed_feed
+
+    def _consumed(self, records):
+        """yields the records, counting them and the time their consumer keeps them"""
+        for record in records:
+            self.records += 1
+            started = time.perf_counter()
+            yield record
+            self.callback_seconds += time.perf_counter() - started
+
+
+def logging_reporter(logger=None, level=logging.INFO):
+    """:return: reporter of ParseMonitor logging the metrics in a single line"""
+    logger = logger or logging.getLogger(__name__)
+
+    def report(metrics):
+        busy = metrics['parse_seconds'] + metrics['callback_seconds']
+        logger.log(level, 'parsed %.1fMB, %d elements (%.0f/s), %d records (%.0f/s) in %.1fs, '
+                          '%.0f%% of it parsing and %.0f%% in callbacks',
+                   metrics['bytes'] / 2**20, metrics['elements'], metrics['elements_per_second'],
+                   metrics['records'], metrics['records_per_second'], metrics['elapsed_seconds'],
+                   100 * metrics['parse_seconds'] / busy if busy else 0.,
+                   100 * metrics['callback_seconds'] / busy if busy else 0.)
+    return report
+
+
+def iter_records(source, spec, chunk_size=2**16, as_tuples=False, namespaces=None, backend='sax', threaded=False,
+                 monitor=None):
+    """yields records extracted from the xml document as their parent tags end,
+    feeding the parser with chunks of the given number of bytes so that the memory used stays bounded.
+
+    :param source: path of the document, possibly compressed or within an archive as read by open_document,
+        or a binary file object
+    :param spec: a RecordSpec, the records being yielded, or an iterable of them, (name, record) pairs being yielded
+    :param as_tuples: whether to yield records as tuples of field values in the order of the fields of the spec
+    :param namespaces: passed to PathRecordsHandler
+    :param backend: the parser used, one of BACKENDS:
+        - 'sax' the xml.sax parser, calling the handler through its adapter layer
+        - 'expat' the expat parser calling the handler directly, with the text buffered between tags
+        - 'lxml' the lxml pull parser, the elements being cleared as soon as they end
+        all of them yield the same records.
+    :param threaded: whether to read and decompress the document in a thread, see open_document
+    :param monitor: ParseMonitor instrumenting the parse, the time the records are kept by the consumer
+        being counted as the callback time
+    """
+    specs = [spec] if isinstance(spec, RecordSpec) else list(spec)
+    single = isinstance(spec, RecordSpec)
+    pending = []
+    handler = PathRecordsHandler(specs, on_record=lambda name, record: pending.append((name, record)),
+                                 namespaces=namespaces)
+    drain = _drain
+    if monitor is not None:
+        handler._start = monitor._counted(handler._start)
+        drain = lambda *args: monitor._consumed(_drain(*args))
+    feed = BACKENDS[backend](handler)
+    if monitor is not None:
+        feed = monitor._timed(feed)
+
+    document = open_document(source, threaded=threaded) if isinstance(source, (str, os.PathLike)) else source
+    try:
+        while chunk := document.read(chunk_size):
+            feed(chunk)
+            yield from drain(pending, single, as_tuples)
+        feed(b'')
+        yield from drain(pending, single, as_tuples)
+    finally:
+        if document is not source:
+            document.close()
+        if monitor is not None:
+            monitor.report()
+
+
+def _drain(pending, single, as_tuples):
+    for name, record in pending:
+        if as_tuples:
+            record = tuple(record.values())
+        yield record if single else (name, record)
+    pending.clear()
+
+
+def iter_records_parallel(path, spec, processes=None, split_size=2**24, as_tuples=False, namespaces=None,
+                          backend='expat', boundary=None):
+    """yields the records of iter_records, in the document order, parsing a large document in a pool of processes.
+    the document is split at the start tags of the parents of the records into parts of about split_size bytes,
+    every part being wrapped with the document before the first parent and after the last one, so that
+    the namespaces declared and the enclosing tags are kept.
+    the parents are assumed not to be nested. every spec has to have its parent path pass through the parent tag,
+    as records before the first parent or after the last one would be repeated with every part.
+
+    :param path: path of the document, memory mapped by each of the processes
+    :param processes: size of the pool, by default the number of processors; with a single one no pool is started.
+        twice as many parts are parsed ahead of the records yielded at most
+    :param boundary: the parent tag as written in the document, e.g. 'prg-ad:PRG_PunktAdresowy',
+        or its local name, e.g. 'PRG_PunktAdresowy', matching it with any prefix;
+        by default the last step of the parent path of the (first) spec
+    """
+    specs = [spec] if isinstance(spec, RecordSpec) else list(spec)
+    if boundary is None:
+        boundary = specs[0].parent.rpartition('/')[2]
+        if boundary.startswith('{'):
+            raise ValueError(f'the boundary tag has to be given for a parent in the Clark notation: {boundary}')
+    outside = [outside_spec.name for outside_spec in specs if not _passes_through(outside_spec.parent, boundary)]
+    if outside:
+        raise ValueError(f'records of specs {outside} may lie outside of the parts split at {boundary}')
+
+    with open(path, 'rb') as document, mmap.mmap(document.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        splits = _split_at_tags(mapped, boundary.encode(), split_size)
+
+    processes = processes or os.cpu_count() or 1
+    jobs = ((path, split, spec, as_tuples, namespaces, backend) for split in splits)
+    if processes == 1 or len(splits) == 1:
+        for job in jobs:
+            yield from _parse_split(*job)
+        return
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        # submitted as the records are consumed, so that the records of the parts parsed ahead stay bounded
+        pending = collections.deque()
+        for job in jobs:
+            pending.append(executor.submit(_parse_split, *job))
+            if len(pending) > 2 * processes:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _passes_through(path, tag):
+    """whether a step of the path names the tag, compared by the local names"""
+    local_name = tag.rpartition(':')[2]
+    return any(re.split('[:}]', step)[-1] == local_name for step in path.split('/'))
+
+
+def _split_at_tags(mapped, tag, split_size):
+    """
+    :param tag: name of the tag as written in the document, a local name matching it with any prefix
+    :return: (head end, start, end, tail start) offsets of the parts, the head and tail enclosing all of them
+    """
+    name = re.escape(tag) if b':' in tag else rb'(?:[^\s<>/:]+:)?' + re.escape(tag)
+    opening = re.compile(rb'<' + name + rb'[\s/>]')
+    first = _find_tag(mapped, opening, 0)
+    if first == -1:
+        return [(0, 0, len(mapped), len(mapped))]
+    last = _find_tag(mapped, opening, len(mapped), reverse=True)
+    closing = re.compile(rb'</' + name + rb'\s*>').search(mapped, last)
+    tail_start = closing.end() if closing else mapped.find(b'>', last) + 1
+
+    splits = []
+    start = first
+    while start < tail_start:
+        end = _find_tag(mapped, opening, min(start + split_size, tail_start))
+        end = tail_start if end == -1 else end
+        splits.append((first, start, end, tail_start))
+        start = end
+    return splits
+
+
+def _find_tag(mapped, opening, position, reverse=False):
+    """:return: offset of the next (or the last before the position) start tag matched, -1 if there is none"""
+    if not reverse:
+        match = opening.search(mapped, position)
+        return match.start() if match else -1
+    # searched back in windows doubling in size, the regular expressions searching only forwards
+    window = 2**16
+    while True:
+        start = max(position - window, 0)
+        match = None
+        for match in opening.finditer(mapped, start, position):
+            pass
+        if match or not start:
+            return match.start() if match else -1
+        window *= 2
+
+
+def _parse_split(path, split, spec, as_tuples, namespaces, backend):
+    head_end, start, end, tail_start = split
+    with open(path, 'rb') as document, mmap.mmap(document.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        part = io.BytesIO(b''.join((mapped[:head_end], mapped[start:end], mapped[tail_start:])))
+    return list(iter_records(part, spec, as_tuples=as_tuples, namespaces=namespaces, backend=backend))
+
+
+class RecordIndex:
+    """index of the records of a large document stored in an sqlite file: their byte offsets, lengths and key fields.
+    records selected by their keys are read back by parsing only their own bytes of the memory mapped document,
+    wrapped with the document before the first record and after the last one as in iter_records_parallel."""
+
+    def __init__(self, index_path):
+        """opens an index built before."""
+        self.__connection = sqlite3.connect(index_path)
+        metadata = dict(self.__connection.execute('SELECT key, value FROM metadata'))
+        self.document_path = metadata['document_path']
+        self.spec = RecordSpec.from_dict(json.loads(metadata['spec']))
+        self.keys = json.loads(metadata['keys'])
+        self.__head_end = int(metadata['head_end'])
+        self.__tail_start = int(metadata['tail_start'])
+
+    @classmethod
+    def build(cls, document_path, spec, keys, index_path, chunk_size=2**20, namespaces=None):
+        """indexes the records of the spec in a single pass over the document, replacing an existing index.
+
+        :param keys: fields of the spec the records can be looked up by, not the multiple ones
+        """
+        if not set(keys) <= spec.fields.keys() or set(keys) & spec.multiple:
+            raise ValueError(f'keys have to be single fields of the spec: {keys}')
+
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        connection = sqlite3.connect(index_path)
+        key_columns = ''.join(f', {_quote(key)} TEXT' for key in keys)
+        connection.execute(f'CREATE TABLE records (offset INTEGER PRIMARY KEY, length INTEGER{key_columns})')
+        connection.execute('CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)')
+        insert = f'INSERT INTO records VALUES ({", ".join("?" * (len(keys) + 2))})'
+
+        rows = []
+        # byte offsets of the start tags still open
+        starts = []
+        with open(document_path, 'rb') as document, \
+                mmap.mmap(document.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+
+            def on_record(name, record):
+                # the end tag being reached, its own end is the end of the record
+                end = mapped.find(b'>', parser.CurrentByteIndex) + 1
+                rows.append((starts[-1], end - starts[-1], *(record[key] for key in keys)))
+
+            parser = _expat_parser(PathRecordsHandler([spec], on_record=on_record, namespaces=namespaces))
+            start_element, end_element = parser.StartElementHandler, parser.EndElementHandler
+
+            def start_indexed_element(name, attrs):
+                starts.append(parser.CurrentByteIndex)
+                start_element(name, attrs)
+
+            def end_indexed_element(name):
+                end_element(name)
+                starts.pop()
+
+            parser.StartElementHandler = start_indexed_element
+            parser.EndElementHandler = end_indexed_element
+
+            head_end, tail_start = len(mapped), 0
+            for position in range(0, len(mapped), chunk_size):
+                parser.Parse(mapped[position:position + chunk_size], False)
+                if rows:
+                    head_end = min(head_end, rows[0][0])
+                    tail_start = rows[-1][0] + rows[-1][1]
+                    connection.executemany(insert, rows)
+                    rows.clear()
+            parser.Parse(b'', True)
+
+        for key in keys:
+            connection.execute(f'CREATE INDEX {_quote("by_" + key)} ON records ({_quote(key)})')
+        connection.executemany('INSERT INTO metadata VALUES (?, ?)', [
+            ('document_path', os.path.abspath(document_path)), ('spec', json.dumps(spec.to_dict())),
+            ('keys', json.dumps(list(keys))), ('head_end', str(head_end)), ('tail_start', str(tail_start))
+        ])
+        connection.commit()
+        connection.close()
+        return cls(index_path)
+
+    def find(self, **keys):
+        """:return: (offset, length) of the records with all the given key values, in the document order"""
+        return self.__connection.execute(*self.__select('offset, length', keys)).fetchall()
+
+    def count(self, **keys):
+        return self.__connection.execute(*self.__select('COUNT(*)', keys)).fetchone()[0]
+
+    def lookup(self, **keys):
+        """:return: the records with all the given key values in the document order, parsed from their bytes"""
+        locations = self.find(**keys)
+        if not locations:
+            return []
+        with open(self.document_path, 'rb') as document, \
+                mmap.mmap(document.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            fragments = b''.join(mapped[offset:offset + length] for offset, length in locations)
+            part = io.BytesIO(b''.join((mapped[:self.__head_end], fragments, mapped[self.__tail_start:])))
+        return list(iter_records(part, self.spec, backend='expat'))
+
+    def __select(self, columns, keys):
+        unknown = keys.keys() - set(self.keys)
+        if unknown:
+            raise KeyError(f'not indexed: {sorted(unknown)}')
+        conditions = ' AND '.join(f'{_quote(key)} IS ?' for key in keys) or '1'
+        return f'SELECT {columns} FROM records WHERE {conditions} ORDER BY offset', tuple(keys.values())
+
+    def close(self):
+        self.__connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class ColumnSink(metaclass=abc.ABCMeta):
+    """collects the records straight into a buffer per field and writes them every batch_size records as a DataFrame.
+    the fields given as categories are kept as codes of their distinct values, which saves the memory of repeated
+    values such as localities or statuses; their categories grow from batch to batch, earlier codes staying valid."""
+
+    def __init__(self, fields, batch_size=2**16, categories=(), multiple=()):
+        """
+        :param fields: names of the fields, in the order of the values appended
+        :param multiple: fields having lists of values, not to be encoded as categories
+        """
+        self.fields = list(fields)
+        self.batch_size = batch_size
+        self.multiple = frozenset(multiple)
+        self.__categories = {field: {} for field in self.fields if field in categories and field not in self.multiple}
+        self.__columns = [self.__empty_column(field) for field in self.fields]
+        self.__length = 0
+
+    def __empty_column(self, field):
+        return array.array('l') if field in self.__categories else []
+
+    def append(self, values):
+        """:param values: values of the fields in their order, e.g. a record of iter_records as a tuple"""
+        for field, column, value in zip(self.fields, self.__columns, values):
+            if field in self.__categories:
+                codes = self.__categories[field]
+                value = -1 if value is None else codes.setdefault(value, len(codes))
+            column.append(value)
+        self.__length += 1
+        if self.__length >= self.batch_size:
+            self.flush()
+
+    def __call__(self, name, record):
+        """appends the record, so that the sink can be used as the on_record callback of PathRecordsHandler."""
+        self.append(record.values())
+
+    def __len__(self):
+        return self.__length
+
+    def flush(self):
+        """writes the records collected, if any."""
+        if not self.__length:
+            return
+        import pandas
+
+        data = {}
+        for field, column in zip(self.fields, self.__columns):
+            if field in self.__categories:
+                data[field] = pandas.Categorical.from_codes(column, categories=list(self.__categories[field]))
+            else:
+                data[field] = pandas.Series(column, dtype=object)
+        self.__columns = [self.__empty_column(field) for field in self.fields]
+        self.__length = 0
+        self._write(pandas.DataFrame(data))
+
+    @abc.abstractmethod
+    def _write(self, frame):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+class FrameSink(ColumnSink):
+    """sink keeping the DataFrame batches written in its frames list, to be taken from there."""
+
+    def __init__(self, fields, batch_size=2**16, categories=(), multiple=()):
+        super().__init__(fields, batch_size, categories, multiple)
+        self.frames = []
+
+    def _write(self, frame):
+        self.frames.append(frame)
+
+
+class CsvSink(ColumnSink):
+    """sink appending the batches to a csv file, with a header before the first one."""
+
+    def __init__(self, path, fields, batch_size=2**16, categories=(), multiple=()):
+        super().__init__(fields, batch_size, categories, multiple)
+        self.path = path
+        self.__header = True
+
+    def _write(self, frame):
+        frame.to_csv(self.path, mode='w' if self.__header else 'a', header=self.__header, index=False)
+        self.__header = False
+
+
+class ParquetSink(ColumnSink):
+    """sink writing every batch as a row group of a parquet file, the categories being dictionary encoded."""
+
+    def __init__(self, path, fields, batch_size=2**16, categories=(), multiple=()):
+        super().__init__(fields, batch_size, categories, multiple)
+        self.path = path
+        self.__writer = None
+
+    def _write(self, frame):
+        import pyarrow
+        import pyarrow.parquet
+
+        if self.__writer is None:
+            # stated explicitly, as a batch of missing values only would have no type otherwise
+            self.__schema = pyarrow.schema([
+                (field, pyarrow.list_(pyarrow.string()) if field in self.multiple
+                 else pyarrow.dictionary(pyarrow.int32(), pyarrow.string()) if frame[field].dtype == 'category'
+                 else pyarrow.string())
+                for field in self.fields
+            ])
+            self.__writer = pyarrow.parquet.ParquetWriter(self.path, self.__schema)
+        self.__writer.write_table(pyarrow.Table.from_pandas(frame, schema=self.__schema, preserve_index=False))
+
+    def close(self):
+        super().close()
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__writer = None
+
+
+def write_records(source, spec, sink, **options):
+    """extracts the records of the spec into the sink, closing it at the end.
+
+    :param sink: ColumnSink with the fields of the spec
+    :param options: passed to iter_records
+    """
+    with sink:
+        for values in iter_records(source, spec, as_tuples=True, **options):
+            sink.append(values)
+
+
+def iter_frames(source, spec, batch_size=2**16, categories=(), **options):
+    """yields the records of the spec in DataFrames of batch_size rows, the last one possibly shorter.
+
+    :param categories: fields to be encoded as categories
+    :param options: passed to iter_records
+    """
+    sink = FrameSink(spec.fields, batch_size, categories, spec.multiple)
+    for values in iter_records(source, spec, as_tuples=True, **options):
+        sink.append(values)
+        if sink.frames:
+            yield sink.frames.pop()
+    sink.close()
+    yield from sink.frames
+
+
+def _sax_feeder(handler):
+    parser = xml.sax.make_parser()
+    parser.setContentHandler(handler)
+
+    def feed(chunk):
+        if chunk:
+            parser.feed(chunk)
+        else:
+            parser.close()
+    return feed
+
+
+def _expat_feeder(handler):
+    parser = _expat_parser(handler)
+    return lambda chunk: parser.Parse(chunk, not chunk)
+
+
+def _expat_parser(handler):
+    import xml.parsers.expat
+
+    # names come as 'namespace local-name', or just the local name outside of any namespace
+    parser = xml.parsers.expat.ParserCreate(namespace_separator=' ')
+    parser.buffer_text = True
+
+    def start_element(name, attrs):
+        namespace, _, local_name = name.rpartition(' ')
+        handler._start(namespace or None, local_name)
+
+    parser.StartNamespaceDeclHandler = lambda prefix, uri: handler.startPrefixMapping(prefix, uri)
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = lambda name: handler._end()
+    parser.CharacterDataHandler = handler.characters
+    return parser
+
+
+def _lxml_feeder(handler):
+    import lxml.etree
+
+    parser = lxml.etree.XMLPullParser(events=('start-ns', 'start', 'end', 'comment', 'pi'),
+                                      resolve_entities=False, huge_tree=True)
+    # lxml keeps the text within elements and after them rather than reporting it as it comes,
+    # the text owed is read once the next event is reached, being complete then
+    owed_text = None
+    owed_tail = None
+
+    def feed(chunk):
+        nonlocal owed_text, owed_tail
+        if chunk:
+            parser.feed(chunk)
+        else:
+            parser.close()
+
+        for event, element in parser.read_events():
+            if owed_text is not None:
+                if owed_text.text:
+                    handler.characters(owed_text.text)
+                owed_text = None
+            elif owed_tail is not None:
+                if owed_tail.tail:
+                    handler.characters(owed_tail.tail)
+                owed_tail = None
+
+            if event == 'start':
+                namespace, _, local_name = element.tag[1:].rpartition('}') if element.tag[0] == '{' \
+                    else (None, None, element.tag)
+                handler._start(namespace, local_name)
+                owed_text = element
+            elif event == 'end':
+                handler._end()
+                # keeping memory flat, the element and the ones before it are not needed anymore
+                element.clear(keep_tail=True)
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+                owed_tail = element
+            elif event == 'start-ns':
+                handler.startPrefixMapping(*element)
+            else:
+                owed_tail = element
+    return feed
+
+
+BACKENDS = {'sax': _sax_feeder, 'expat': _expat_feeder, 'lxml': _lxml_feeder}
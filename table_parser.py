@@ -1,16 +1,147 @@
+import abc
+import collections
+import concurrent.futures
 import dependency_injector.providers as diProviders
+import hashlib
+import html
 import pandas as pd
 import itertools
-from typing import Iterable, List, Any
+import json
+import os
+import pathlib
+import re
+import traceback
+import warnings
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+class TableBackend(metaclass=abc.ABCMeta):
+    """access to the rows and cells of a parsed html table."""
+
+    @abc.abstractmethod
+    def rows(self, table) -> List:
+        pass
+
+    @abc.abstractmethod
+    def header_cells(self, row) -> List:
+        pass
+
+    @abc.abstractmethod
+    def cells(self, row) -> List:
+        pass
+
+    @abc.abstractmethod
+    def describe(self, cell) -> Tuple[str, int, int]:
+        """
+        :return: stripped text, rowspan and colspan of the cell
+        """
+        pass
+
+    @abc.abstractmethod
+    def markup(self, table) -> bytes:
+        pass
+
+    def row_markup(self, row) -> Optional[bytes]:
+        """
+        :return: markup a row is recognised by between snapshots of a table, None where serialising the row
+            costs more than describing its cells, the row being recognised by its described cells then
+        """
+        return None
+
+
+class SoupTableBackend(TableBackend):
+    """backend for tables being BeautifulSoup tags."""
+
+    def rows(self, table) -> List:
+        return table.find_all('tr')
+
+    def header_cells(self, row) -> List:
+        return row.find_all('th')
+
+    def cells(self, row) -> List:
+        return row.find_all(['td', 'th'])
+
+    def describe(self, cell) -> Tuple[str, int, int]:
+        return cell.text.strip(), _span(cell.attrs.get('rowspan')), _span(cell.attrs.get('colspan'))
+
+    def markup(self, table) -> bytes:
+        return str(table).encode()
+
+
+class LxmlTableBackend(TableBackend):
+    """backend for tables being lxml elements, walked by lxml itself without building a soup."""
+
+    def __init__(self) -> None:
+        import lxml.etree
+
+        self.__string = lxml.etree.XPath('string()')
+        # text within style and script tags is left out, as it is by BeautifulSoup
+        self.__visible_text = lxml.etree.XPath('.//text()[not(ancestor::style or ancestor::script)]')
+
+    @staticmethod
+    def fromstring(markup: Union[bytes, str], selector: Optional[str] = None, index: int = 0):
+        """
+        :param selector: XPath expression selecting tables within the markup
+        :param index: which of the selected tables to take
+        :return: element of the selected table, by default the first table within the markup
+        """
+        import lxml.html
+
+        root = lxml.html.fromstring(markup)
+        if selector:
+            return root.xpath(selector)[index]
+        return root if root.tag == 'table' else next(root.iter('table'))
+
+    def rows(self, table) -> List:
+        return list(table.iter('tr'))
+
+    def header_cells(self, row) -> List:
+        return list(row.iter('th'))
+
+    def cells(self, row) -> List:
+        return list(row.iter('td', 'th'))
+
+    def describe(self, cell) -> Tuple[str, int, int]:
+        if not len(cell):
+            # most cells hold their text alone, read without evaluating an XPath
+            text: str = cell.text or ''
+        elif next(cell.iter('style', 'script'), None) is not None:
+            text = ''.join(self.__visible_text(cell))
+        else:
+            text = self.__string(cell)
+        return text.strip(), _span(cell.get('rowspan')), _span(cell.get('colspan'))
+
+    def markup(self, table) -> bytes:
+        import lxml.etree
+
+        return lxml.etree.tostring(table, with_tail=False)
+
+    def row_markup(self, row) -> bytes:
+        return self.markup(row)
 
 
 class WebTableParser:
-    def __init__(self, table) -> None:
+    def __init__(self, table, backend: TableBackend = None) -> None:
+        """
+        :param table: BeautifulSoup tag, lxml element or raw html of the table
+        :param backend: by default chosen according to the type of the table
+        """
+        self.source_markup: Optional[bytes] = None
+        if isinstance(table, (bytes, str)):
+            self.source_markup = table if isinstance(table, bytes) else table.encode()
+            table = LxmlTableBackend.fromstring(table)
+            backend = backend or LxmlTableBackend()
         self.table = table
+        self.backend: TableBackend = backend or self._choose_backend(table)
         self.header: List = []
         self.header_rows_limit: int = 0
         self.first_rows_to_skip: int = 0
         self.last_rows_to_skip: int = 0
+        self.data_colspans_expanded: bool = False
+        self.column_converter: Optional[ColumnConverter] = None
+        self.table_plan: Optional[TablePlan] = None
+        self.plan_matched: Optional[bool] = None
+        self.parse_cache: Optional[ParseCache] = None
 
     def skip_rows(self, first: int = 0, last: int = 0):
         self.first_rows_to_skip = first
@@ -25,103 +156,693 @@ class WebTableParser:
         self.header = column_names
         return self
 
+    def expand_colspans(self, expand: bool = True):
+        """repeats the text of data cells spanning several columns in each of them,
+        by default such a cell makes up a single column as header cells are the only ones expanded."""
+        self.data_colspans_expanded = expand
+        return self
+
+    def convert_types(self, converter: 'ColumnConverter' = None):
+        """builds the data frame column by column converting each to a numeric, datetime or categorical type,
+        by default every cell stays a string."""
+        self.column_converter = converter or ColumnConverter()
+        return self
+
+    def apply_plan(self, plan: 'TablePlan'):
+        """takes the header and the row settings from a plan of a table with the same layout.
+        the header rows are then only fingerprinted instead of parsed,
+        when the fingerprint differs from the planned one the table is parsed in full."""
+        self.table_plan = plan
+        self.header_rows_limit = plan.header_rows_limit
+        self.first_rows_to_skip = plan.first_rows_to_skip
+        self.last_rows_to_skip = plan.last_rows_to_skip
+        self.data_colspans_expanded = plan.data_colspans_expanded
+        return self
+
+    def cache(self, parse_cache: 'ParseCache'):
+        """looks parsed tables up in the cache by their markup and the parser settings."""
+        self.parse_cache = parse_cache
+        return self
+
+    def plan(self) -> 'TablePlan':
+        """
+        :return: plan of the table resolving its header with the current settings
+        """
+        rows: List = self.backend.rows(self.table)
+        header_cells: List[List] = self._select_header_cells(rows if not self.header_rows_limit else rows[:self.header_rows_limit])
+        header: List[str] = self.header if bool(self.header) else self._parse_headers(header_cells)
+        return TablePlan(header, len(header_cells), self._fingerprint(header_cells), self.header_rows_limit,
+                         self.first_rows_to_skip, self.last_rows_to_skip, self.data_colspans_expanded)
+
+    @staticmethod
+    def _choose_backend(table) -> TableBackend:
+        return SoupTableBackend() if hasattr(table, 'find_all') else LxmlTableBackend()
+
     def parse(self) -> pd.DataFrame:
-        rows: List = self.table.find_all('tr')
+        if self.parse_cache:
+            if self.table_plan:
+                # matched as a parse would, the frame possibly coming from the cache
+                self.plan_matched = self._matches_plan(self.backend.rows(self.table))
+            return self.parse_cache.get_or_parse(self._cache_key(), self._parse)
+        return self._parse()
+
+    def _parse(self) -> pd.DataFrame:
+        header, data_rows = self._split_rows()
+        return self._build_frame(self._parse_data(self._select_data_cells(data_rows)), header)
+
+    def _cache_key(self) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(self.source_markup or self.backend.markup(self.table))
+        settings: tuple = (type(self.backend).__name__, self.header, self.header_rows_limit, self.first_rows_to_skip,
+                           self.last_rows_to_skip, self.data_colspans_expanded,
+                           vars(self.column_converter) if self.column_converter else None,
+                           self.table_plan.to_dict() if self.table_plan else None)
+        digest.update(repr(settings).encode())
+        return digest.hexdigest()
+
+    def parse_arrow(self):
+        """
+        :return: pyarrow Table with the index as its first column
+        """
+        import pyarrow
+
+        header, data_rows = self._split_rows()
+        frame: pd.DataFrame = self._build_frame(self._parse_data(self._select_data_cells(data_rows)), header)
+        arrays: List = [pyarrow.Array.from_pandas(frame.index.to_series())]
+        arrays.extend(pyarrow.Array.from_pandas(frame.iloc[:, column_index]) for column_index in range(frame.shape[1]))
+        # columns are taken one by one as the names are not necessarily unique
+        return pyarrow.Table.from_arrays(arrays, names=[header[0] if header else ''] + list(map(str, frame.columns)))
+
+    def iter_rows(self) -> Iterator[List[str]]:
+        """yields the parsed data rows one at a time, the index cell being the first one.
+        rowspans are resolved as the rows go, so only the rows pending from above are held."""
+        _, data_rows = self._split_rows()
+        yield from self._parse_data(self._select_data_cells(data_rows))
+
+    def iter_chunks(self, size: int) -> Iterator[pd.DataFrame]:
+        """yields consecutive parts of the parsed table as data frames of at most the given number of rows."""
+        header, data_rows = self._split_rows()
+        parsed_rows: Iterator[List[str]] = self._parse_data(self._select_data_cells(data_rows))
+        while chunk := list(itertools.islice(parsed_rows, size)):
+            yield self._build_frame(chunk, header)
+
+    def parse_incremental(self, previous: Optional['TableSnapshot'] = None) -> 'TableSnapshot':
+        """parses the table reusing the rows resolved for its previous snapshot.
+        rows are recognised by digests of their markup, or of their described cells where the backend cannot
+        serialise them cheaply, together with the rowspans pending from above them,
+        so that only the changed and the new rows, and the rows their rowspans reach, are resolved again.
+        the saving comes from the lxml backend serialising rows cheaply; on soups it costs about as much as parse,
+        still telling the changed rows."""
+        header, rows = self._split_rows()
+        known_rows: Dict[tuple, tuple] = previous.resolved_rows if previous else {}
+        resolved_rows: Dict[tuple, tuple] = {}
+        grid = SpanGrid()
+        describe: Callable = self.backend.describe if self.data_colspans_expanded else self._describe_cell_without_colspan
+
+        parsed_rows: List[List[str]] = []
+        fingerprints: List[str] = []
+        changed_rows: List[int] = []
+        for position, row in enumerate(self._select_data_rows(rows)):
+            markup: Optional[bytes] = self.backend.row_markup(row)
+            described_cells: Optional[List[Tuple[str, int, int]]] = None
+            if markup is not None:
+                fingerprint: str = hashlib.blake2b(markup, digest_size=16).hexdigest()
+            else:
+                described_cells = list(map(describe, self.backend.cells(row)))
+                fingerprint: str = self._digest((described_cells,))
+            key: tuple = (fingerprint, grid.state())
+            if key in known_rows:
+                parsed_row, state = known_rows[key]
+                grid.restore(state)
+            else:
+                parsed_row = grid.resolve(described_cells if described_cells is not None
+                                          else map(describe, self.backend.cells(row)))
+                state = grid.state()
+                changed_rows.append(position)
+            resolved_rows[key] = (parsed_row, state)
+            parsed_rows.append(parsed_row)
+            fingerprints.append(fingerprint)
+
+        kept_fingerprints: set = set(fingerprints)
+        removed_rows: List[int] = [position for position, fingerprint in enumerate(previous.fingerprints if previous else ())
+                                   if fingerprint not in kept_fingerprints]
+        return TableSnapshot(self._build_frame(parsed_rows, header), fingerprints, resolved_rows, changed_rows, removed_rows)
+
+    def _split_rows(self) -> Tuple[List[str], List]:
+        """
+        :return: the header and the rows following the header ones
+        """
+        rows: List = self.backend.rows(self.table)
+        if self.table_plan:
+            self.plan_matched = self._matches_plan(rows)
+            if self.plan_matched:
+                return self.table_plan.header, rows[self.table_plan.header_row_count:]
+
         header_rows: List = rows if not self.header_rows_limit else rows[:self.header_rows_limit]
         header_cells: List[List] = self._select_header_cells(header_rows)
         header: List[str] = self.header if bool(self.header) else self._parse_headers(header_cells)
-        data_rows: List = rows[len(header_cells):]
-        parsed_rows: List[List[str]] = self._parse_data(self._select_data_cells(data_rows))
-        parsed_rows_without_index: List[List[str]] = [[parsed_rows[i][j] for j in range(1, len(parsed_rows[i]))] for i in range(len(parsed_rows))]
-        return pd.DataFrame(parsed_rows_without_index, columns=header[1:], index=[parsed_rows[n][0] for n in range(len(parsed_rows))])
+        return header, rows[len(header_cells):]
+
+    def _matches_plan(self, rows: List) -> bool:
+        count: int = self.table_plan.header_row_count
+        header_cells: List[List] = list(map(self.backend.header_cells, rows[:count]))
+        if not all(header_cells) or self._fingerprint(header_cells) != self.table_plan.fingerprint:
+            return False
+        # header rows have to end where they did in the planned table
+        return count == self.header_rows_limit or len(rows) <= count or not self.backend.header_cells(rows[count])
+
+    def _fingerprint(self, cells_list: List[List]) -> str:
+        return self._digest(map(self.backend.describe, cells) for cells in cells_list)
 
     @staticmethod
-    def _select_header_cells(rows: Iterable) -> List[List]:
-        header_cells: Iterable[List] = map(lambda row: row.find_all('th'), rows)
+    def _digest(described_rows: Iterable[Iterable[Tuple[str, int, int]]]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for described_cells in described_rows:
+            for text, rowspan, colspan in described_cells:
+                digest.update(f'{text}\x1f{rowspan}\x1f{colspan}\x1e'.encode())
+            digest.update(b'\x1d')
+        return digest.hexdigest()
+
+    def _build_frame(self, parsed_rows: Iterable[List[str]], header: List[str]) -> pd.DataFrame:
+        if self.column_converter:
+            return self._build_typed_frame(parsed_rows, header)
+
+        index: List[str] = []
+        parsed_rows_without_index: List[List[str]] = []
+        width: int = len(header) - 1
+        for parsed_row in parsed_rows:
+            index.append(parsed_row[0])
+            row: List[Optional[str]] = parsed_row[1:]
+            # padded to the header, as a chunk may hold no row spanning the whole width
+            row.extend(itertools.repeat(None, width - len(row)))
+            parsed_rows_without_index.append(row)
+        return pd.DataFrame(parsed_rows_without_index, columns=header[1:], index=index)
+
+    def _build_typed_frame(self, parsed_rows: Iterable[List[str]], header: List[str]) -> pd.DataFrame:
+        index: List[str] = []
+        buffers: List[List[Optional[str]]] = [[] for _ in range(len(header) - 1)]
+        for parsed_row in parsed_rows:
+            if len(parsed_row) > len(header):
+                raise ValueError(f'{len(buffers)} columns passed, passed data had {len(parsed_row) - 1} columns')
+            index.append(parsed_row[0])
+            for buffer, value in itertools.zip_longest(buffers, itertools.islice(parsed_row, 1, None)):
+                buffer.append(value)
+
+        frame = pd.DataFrame({
+            column_index: self.column_converter.convert(buffer) for column_index, buffer in enumerate(buffers)
+        })
+        frame.index = pd.Index(index, dtype=object)
+        frame.columns = header[1:]
+        return frame
+
+    def _select_header_cells(self, rows: Iterable) -> List[List]:
+        header_cells: Iterable[List] = map(self.backend.header_cells, rows)
         return list(itertools.takewhile(lambda cells: len(cells) > 0, header_cells))
 
     def _parse_headers(self, cells_list: List[List]) -> List[str]:
-        parsed_table: List[List] = [[] for n in range(len(cells_list))]
-        for row_index in range(len(cells_list)):
-            # copies row with DummyCells all with colspan 1
-            copied_row = []
-            for a_cell in cells_list[row_index]:
-                copied_row.extend([self.DummyCell(a_cell)] * int(a_cell.attrs.get('colspan', 1)))
-
-            # inserts here what is thrown from above by rowspan
-            copied_row: List = self._adjust(copied_row, parsed_table[row_index])
-
-            parsed_table[row_index] = [None] * len(copied_row)
-            for cell_index in range(len(copied_row)):
-                a_cell = copied_row[cell_index]
-                parsed_table[row_index][cell_index] = a_cell.text
-
-                # handle rowspans
-                if rowspan := int(a_cell.attrs.get('rowspan', 0)):
-                    a_cell.attrs['rowspan'] = 0
-                    row_below_indices: List[int] = list(range(rowspan-2, 0, -1))
-                    self._insert(parsed_table[row_index + rowspan-1], cell_index, a_cell)
-                    a_cell.text = ''
-                    for row_below_index in row_below_indices:
-                        self._insert(parsed_table[row_index + row_below_index], cell_index, a_cell)
-
-        header_columns: Iterable[Iterable[str]] = map(lambda column_index: (parsed_table[row_index][column_index] for row_index in range(len(parsed_table))), range(len(parsed_table[0])))
+        # text of a rowspanned header cell is kept only in its top row
+        grid = SpanGrid(carried_text='')
+        parsed_table: List[List] = [grid.resolve(map(self.backend.describe, cells)) for cells in cells_list]
+        width: int = max(map(len, parsed_table), default=0)
+
+        header_columns: Iterable[Iterable[str]] = map(lambda column_index: (row[column_index] for row in parsed_table if column_index < len(row)), range(width))
 
         return list(map(lambda header_column: '-'.join(filter(None, header_column)), header_columns))
 
-    class DummyCell:
-        def __init__(self, cell) -> None:
-            self.text = cell.text.strip()
-            self.attrs = {'rowspan': cell.attrs.get('rowspan', 0)}
+    def _select_data_cells(self, rows: Iterable) -> Iterator[List]:
+        data_cells: Iterator[List] = itertools.dropwhile(lambda cells: len(cells) == 0, map(self.backend.cells, rows))
+        return self._drop_last(itertools.islice(data_cells, self.first_rows_to_skip, None), self.last_rows_to_skip)
 
-    def _select_data_cells(self, rows: Iterable) -> List[List]:
-        data_cells: List[List] = list(itertools.dropwhile(lambda cells: len(cells) == 0, map(lambda row: row.find_all(['td', 'th']), rows)))
-        return data_cells[self.first_rows_to_skip:len(data_cells)-self.last_rows_to_skip]
+    def _select_data_rows(self, rows: Iterable) -> Iterator:
+        data_rows: Iterator = itertools.dropwhile(lambda row: len(self.backend.cells(row)) == 0, rows)
+        return self._drop_last(itertools.islice(data_rows, self.first_rows_to_skip, None), self.last_rows_to_skip)
 
-    def _parse_data(self, cells_list: List[List]) -> List[List[str]]:
-        # return map(lambda cells: [cell.text.strip() for cell in cells], cells_list)
+    @staticmethod
+    def _drop_last(items: Iterable, count: int) -> Iterator:
+        # holds back only as many items as are to be dropped
+        held_back: collections.deque = collections.deque()
+        for item in items:
+            held_back.append(item)
+            if len(held_back) > count:
+                yield held_back.popleft()
 
-        parsed_table: List[List] = [[] for n in range(len(cells_list))]
-        for row_index in range(len(cells_list)):
-            # copies row with DummyCells all with colspan 1
-            copied_row = [self.DummyCell(a_cell) for a_cell in cells_list[row_index]]
+    def _parse_data(self, cells_list: Iterable[List]) -> Iterator[List[str]]:
+        # rowspans extending onto the skipped rows are never resolved
+        grid = SpanGrid()
+        describe: Callable = self.backend.describe if self.data_colspans_expanded else self._describe_cell_without_colspan
+        return (grid.resolve(map(describe, cells)) for cells in cells_list)
 
-            # inserts here what is thrown from above by rowspan
-            copied_row: List = self._adjust(copied_row, parsed_table[row_index])
+    def _describe_cell_without_colspan(self, cell) -> Tuple[str, int, int]:
+        text, rowspan, _ = self.backend.describe(cell)
+        return text, rowspan, 1
 
-            parsed_table[row_index] = [None] * len(copied_row)
-            for cell_index in range(len(copied_row)):
-                a_cell = copied_row[cell_index]
-                parsed_table[row_index][cell_index] = a_cell.text.strip()
 
-                # handle rowspans
-                if rowspan := int(a_cell.attrs.get('rowspan', 0)):
-                    a_cell.attrs['rowspan'] = 0
-                    row_below_indices: List[int] = list(range(rowspan - 2, 0, -1))
-                    # not to extend onto the skipped rows
-                    if row_index + rowspan - 1 < len(parsed_table):
-                        self._insert(parsed_table[row_index + rowspan - 1], cell_index, a_cell)
-                    for row_below_index in filter(lambda below_index: row_index + below_index < len(parsed_table), row_below_indices):
-                        self._insert(parsed_table[row_index + row_below_index], cell_index, a_cell)
+class TablePlan:
+    """header and row settings resolved by a parser, to be applied to tables with the same layout.
+    serializable with to_dict and from_dict."""
 
-        return parsed_table
+    def __init__(self, header: List[str], header_row_count: int, fingerprint: str, header_rows_limit: int = 0,
+                 first_rows_to_skip: int = 0, last_rows_to_skip: int = 0, data_colspans_expanded: bool = False) -> None:
+        """
+        :param header_row_count: number of rows the header was resolved from
+        :param fingerprint: digest of the texts and spans of the header cells
+        """
+        self.header: List[str] = header
+        self.header_row_count: int = header_row_count
+        self.fingerprint: str = fingerprint
+        self.header_rows_limit: int = header_rows_limit
+        self.first_rows_to_skip: int = first_rows_to_skip
+        self.last_rows_to_skip: int = last_rows_to_skip
+        self.data_colspans_expanded: bool = data_colspans_expanded
 
-    @staticmethod
-    def _insert(array: List, index: int, item: Any) -> None:
-        length: int = len(array)
-        if length > index:
-            array[index] = item
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, plan: dict) -> 'TablePlan':
+        return cls(**plan)
+
+
+class ColumnConverter:
+    """converts a column of parsed texts to the most compact type fitting all of its non-empty values.
+    integers come first, then floats, datetimes and finally categories for columns with few distinct values;
+    columns fitting none of these stay strings. missing and empty cells become missing values."""
+
+    def __init__(self, thousands: str = ',', footnotes: Optional[str] = r'\[[^\]]*\]', percents: bool = True,
+                 dates: bool = True, date_format: Optional[str] = None, category_ratio: float = 0.5) -> None:
+        """
+        :param thousands: characters separating thousands, removed before numeric conversion
+        :param footnotes: regular expression of footnote marks removed before any conversion, e.g. '300[a]'
+        :param percents: whether to read '12.5%' as the number 12.5
+        :param dates: whether to try datetime conversion
+        :param date_format: strftime format of the dates, inferred from the first one by default
+        :param category_ratio: highest ratio of distinct to all values for which a column is categorical
+        """
+        self.thousands: str = thousands
+        self.footnotes: Optional[str] = footnotes
+        self.percents: bool = percents
+        self.dates: bool = dates
+        self.date_format: Optional[str] = date_format
+        self.category_ratio: float = category_ratio
+
+    def convert(self, values: List[Optional[str]]) -> pd.Series:
+        texts = pd.Series(values, dtype=object)
+        cleaned: pd.Series = texts.str.replace(self.footnotes, '', regex=True) if self.footnotes else texts
+        cleaned = cleaned.str.strip()
+        present: pd.Series = cleaned.notna() & (cleaned != '')
+        if not present.any():
+            return texts
+
+        converted: Optional[pd.Series] = self._to_number(cleaned, present)
+        if converted is None and self.dates:
+            converted = self._to_datetime(cleaned, present)
+        if converted is not None:
+            return converted
+
+        texts = texts.where(present)
+        if texts.nunique() <= self.category_ratio * present.sum():
+            return texts.astype('category')
+        return texts
+
+    def _to_number(self, cleaned: pd.Series, present: pd.Series) -> Optional[pd.Series]:
+        numeric: pd.Series = cleaned.where(present)
+        if self.thousands:
+            numeric = numeric.str.replace(f'[{re.escape(self.thousands)}]', '', regex=True)
+        if self.percents:
+            numeric = numeric.str.removesuffix('%')
+        numbers: pd.Series = pd.to_numeric(numeric, errors='coerce')
+        if not numbers.notna().equals(present):
+            return None
+
+        present_numbers: pd.Series = numbers[present]
+        if not (present_numbers % 1 == 0).all():
+            return numbers.astype('float64')
+        # the smallest integer type holding the values, nullable when some are missing
+        smallest: str = pd.to_numeric(present_numbers.astype('int64'), downcast='integer').dtype.name
+        return numbers.astype(smallest if present.all() else smallest.capitalize())
+
+    def _to_datetime(self, cleaned: pd.Series, present: pd.Series) -> Optional[pd.Series]:
+        with warnings.catch_warnings():
+            # inferring the format from the first date warns when there is none
+            warnings.simplefilter('ignore', UserWarning)
+            dates: pd.Series = pd.to_datetime(cleaned.where(present), format=self.date_format, errors='coerce')
+        return dates if dates.notna().equals(present) else None
+
+
+class SpanGrid:
+    """occupancy grid resolving rowspans and colspans of consecutive table rows.
+    rows are resolved one at a time and every cell is placed exactly once;
+    the columns a cell spans downwards are remembered and filled in when the rows below are resolved."""
+
+    def __init__(self, carried_text: Optional[str] = None) -> None:
+        """
+        :param carried_text: text put in the rows below a rowspanning cell,
+            by default the text of the cell itself is repeated.
+        """
+        self.carried_text: Optional[str] = carried_text
+        self.pending_texts: List[Optional[str]] = []
+        self.pending_counts: List[int] = []
+
+    def state(self) -> tuple:
+        """
+        :return: hashable description of the rowspans pending for the next row
+        """
+        return tuple((column, self.pending_texts[column], count) for column, count in enumerate(self.pending_counts) if count)
+
+    def restore(self, state: tuple) -> None:
+        width: int = state[-1][0] + 1 if state else 0
+        self.pending_texts = [None] * width
+        self.pending_counts = [0] * width
+        for column, text, count in state:
+            self.pending_texts[column] = text
+            self.pending_counts[column] = count
+
+    def resolve(self, cells: Iterable[Tuple[str, int, int]]) -> List[Optional[str]]:
+        """
+        :param cells: (text, rowspan, colspan) of the cells in the row, in document order
+        :return: texts of the row with spanned cells expanded; gaps left by malformed rows are None.
+        """
+        texts: List[Optional[str]] = self.pending_texts
+        counts: List[int] = self.pending_counts
+        width: int = len(counts)
+        row: List[Optional[str]] = []
+        column: int = 0
+
+        for text, rowspan, colspan in cells:
+            while column < width and counts[column]:
+                row.append(texts[column])
+                counts[column] -= 1
+                column += 1
+
+            carried: str = text if self.carried_text is None else self.carried_text
+            for _ in range(colspan):
+                row.append(text)
+                if column < width:
+                    texts[column] = carried
+                    counts[column] = rowspan - 1
+                else:
+                    texts.append(carried)
+                    counts.append(rowspan - 1)
+                    width += 1
+                column += 1
+
+        last_pending: int = max((index for index in range(column, width) if counts[index]), default=column - 1)
+        for index in range(column, last_pending + 1):
+            if counts[index]:
+                row.append(texts[index])
+                counts[index] -= 1
+            else:
+                row.append(None)
+
+        return row
+
+
+def _span(value: Optional[str]) -> int:
+    if value is None:
+        return 1
+    try:
+        return max(int(value), 1)
+    except ValueError:
+        return 1
+
+
+class TableSnapshot:
+    def __init__(self, frame: pd.DataFrame, fingerprints: List[str], resolved_rows: Dict[tuple, tuple],
+                 changed_rows: List[int], removed_rows: List[int]) -> None:
+        """
+        :param fingerprints: digests of the markup of the data rows
+        :param resolved_rows: parsed rows and the rowspans pending below them,
+            keyed by the digests and the rowspans pending above them
+        :param changed_rows: positions of the rows resolved anew
+        :param removed_rows: positions in the previous snapshot of the rows no longer present
+        """
+        self.frame: pd.DataFrame = frame
+        self.fingerprints: List[str] = fingerprints
+        self.resolved_rows: Dict[tuple, tuple] = resolved_rows
+        self.changed_rows: List[int] = changed_rows
+        self.removed_rows: List[int] = removed_rows
+
+
+class ParseCache:
+    """parsed tables keyed by digests of their markup and parser settings.
+    recently used ones are held in memory up to the given size, all of them are optionally written to a directory.
+    frames are copied both in and out of the cache so that it is unaffected by their modification."""
+
+    def __init__(self, max_bytes: int = 256 * 2**20, directory: Union[str, os.PathLike, None] = None,
+                 file_format: str = 'parquet') -> None:
+        """
+        :param max_bytes: total deep memory usage of the frames held in memory
+        :param directory: where frames are stored, with pyarrow; nothing is stored by default
+        :param file_format: 'parquet' or 'feather'
+        """
+        self.max_bytes: int = max_bytes
+        self.directory: Optional[pathlib.Path] = pathlib.Path(directory) if directory is not None else None
+        self.file_format: str = file_format
+        self.hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+        self.__frames: collections.OrderedDict = collections.OrderedDict()
+        self.__sizes: Dict[str, int] = {}
+        self.__held_bytes: int = 0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get_or_parse(self, key: str, parse: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        frame: Optional[pd.DataFrame] = self.get(key)
+        if frame is None:
+            frame = parse()
+            self.put(key, frame)
+        return frame
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        if key in self.__frames:
+            self.hits += 1
+            self.__frames.move_to_end(key)
+            return self.__frames[key].copy()
+
+        if self.directory is not None and self.__path(key).exists():
+            self.disk_hits += 1
+            frame: pd.DataFrame = self.__read(self.__path(key))
+            self.__hold(key, frame)
+            return frame.copy()
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, frame: pd.DataFrame) -> None:
+        frame = frame.copy()
+        self.__hold(key, frame)
+        if self.directory is not None:
+            self.__write(self.__path(key), frame)
+
+    def statistics(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'frames': len(self.__frames), 'bytes': self.__held_bytes}
+
+    def clear(self) -> None:
+        """empties the memory, the stored files are kept."""
+        self.__frames.clear()
+        self.__sizes.clear()
+        self.__held_bytes = 0
+
+    def __hold(self, key: str, frame: pd.DataFrame) -> None:
+        # the usage of a frame includes its index
+        size: int = int(frame.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        if key in self.__frames:
+            self.__held_bytes -= self.__sizes[key]
+        self.__frames[key] = frame
+        self.__frames.move_to_end(key)
+        self.__sizes[key] = size
+        self.__held_bytes += size
+        while self.__held_bytes > self.max_bytes:
+            evicted, _ = self.__frames.popitem(last=False)
+            self.__held_bytes -= self.__sizes.pop(evicted)
+
+    def __path(self, key: str) -> pathlib.Path:
+        return self.directory / f'{key}.{self.file_format}'
+
+    def __write(self, path: pathlib.Path, frame: pd.DataFrame) -> None:
+        import pyarrow
+
+        # column names are not necessarily unique strings, they are stored in the metadata instead
+        stored = frame.set_axis([str(n) for n in range(frame.shape[1])], axis=1).reset_index(names='index')
+        table = pyarrow.Table.from_pandas(stored, preserve_index=False)
+        table = table.replace_schema_metadata({**table.schema.metadata, b'columns': json.dumps(list(frame.columns)).encode()})
+        if self.file_format == 'feather':
+            import pyarrow.feather
+            pyarrow.feather.write_feather(table, path)
         else:
-            array.extend([None] * (index - length))
-            array.append(item)
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(table, path)
 
-    @staticmethod
-    def _adjust(adjusted: List, adjustee: List) -> List:
-        glued = adjusted.copy()
-        for i in range(len(adjustee)):
-            if adjustee[i] is not None:
-                glued.insert(i, adjustee[i])
-        return glued
+    def __read(self, path: pathlib.Path) -> pd.DataFrame:
+        if self.file_format == 'feather':
+            import pyarrow.feather
+            table = pyarrow.feather.read_table(path)
+        else:
+            import pyarrow.parquet
+            table = pyarrow.parquet.read_table(path)
+        frame: pd.DataFrame = table.to_pandas().set_index('index')
+        frame.index.name = None
+        frame.columns = json.loads(table.schema.metadata[b'columns'])
+        return frame
+
+
+class TableEntry:
+    def __init__(self, position: int, start: int, depth: int, id: Optional[str] = None,
+                 classes: List[str] = (), caption: Optional[str] = None) -> None:
+        """
+        :param position: number of tables preceding this one in the document
+        :param start: offset of the opening tag in the markup bytes
+        :param depth: number of tables this one is nested in
+        """
+        self.position: int = position
+        self.start: int = start
+        self.end: Optional[int] = None
+        self.depth: int = depth
+        self.id: Optional[str] = id
+        self.classes: List[str] = list(classes)
+        self.caption: Optional[str] = caption
+
+
+class TableIndex:
+    """positions, ids, classes and captions of all the tables in an html document, found in a single scan of its bytes.
+    the markup of a chosen table can then be parsed on its own instead of the whole document."""
+
+    __tags = re.compile(rb'<!--.*?-->|<(script|style)\b.*?</\1\s*>|<(/?)(table|caption)\b([^>]*)>', re.S | re.I)
+    __attributes = re.compile(rb'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+    __inner_tags = re.compile(r'<[^>]*>')
+    __charset = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w-]+)', re.I)
+
+    def __init__(self, markup: bytes) -> None:
+        self.markup_bytes: bytes = markup
+        self.encoding: str = self.__detect_encoding(markup)
+        self.tables: List[TableEntry] = []
+        self.__scan()
+
+    def __detect_encoding(self, markup: bytes) -> str:
+        if markup.startswith(b'\xef\xbb\xbf'):
+            return 'utf-8-sig'
+        declared = self.__charset.search(markup, 0, 4096)
+        return declared.group(1).decode('ascii') if declared else 'utf-8'
+
+    def __scan(self) -> None:
+        open_tables: List[TableEntry] = []
+        caption_start: Optional[int] = None
+        for tag in self.__tags.finditer(self.markup_bytes):
+            if tag.group(3) is None:
+                continue
+            closing: bool = bool(tag.group(2))
+            if tag.group(3).lower() == b'table':
+                if not closing:
+                    entry = TableEntry(len(self.tables), tag.start(), len(open_tables), **self.__read_attributes(tag.group(4)))
+                    self.tables.append(entry)
+                    open_tables.append(entry)
+                elif open_tables:
+                    open_tables.pop().end = tag.end()
+            elif open_tables and open_tables[-1].caption is None:
+                if not closing:
+                    caption_start = tag.end()
+                elif caption_start is not None:
+                    open_tables[-1].caption = self.__read_text(self.markup_bytes[caption_start:tag.start()])
+                    caption_start = None
+
+        for entry in open_tables:
+            entry.end = len(self.markup_bytes)
+
+    def __read_attributes(self, attributes: bytes) -> dict:
+        read: dict = {}
+        for attribute in self.__attributes.finditer(attributes):
+            name: str = attribute.group(1).decode(self.encoding, 'replace').lower()
+            value: bytes = next((group for group in attribute.groups()[1:] if group is not None), b'')
+            if name == 'id':
+                read['id'] = html.unescape(value.decode(self.encoding, 'replace'))
+            elif name == 'class':
+                read['classes'] = html.unescape(value.decode(self.encoding, 'replace')).split()
+        return read
+
+    def __read_text(self, markup: bytes) -> str:
+        return html.unescape(self.__inner_tags.sub('', markup.decode(self.encoding, 'replace'))).strip()
+
+    def find_all(self, id: Optional[str] = None, class_: Optional[str] = None, caption: Optional[str] = None) -> List[TableEntry]:
+        """
+        :param class_: one of the classes of the table
+        :param caption: text contained in the caption of the table
+        :return: tables meeting all the given conditions in the document order
+        """
+        return [entry for entry in self.tables
+                if (id is None or entry.id == id)
+                and (class_ is None or class_ in entry.classes)
+                and (caption is None or caption in (entry.caption or ''))]
+
+    def markup(self, entry: TableEntry) -> str:
+        """
+        :return: decoded markup of the table, to be given to WebTableParser
+        """
+        return self.markup_bytes[entry.start:entry.end].decode(self.encoding, 'replace')
+
+
+class TableJob:
+    """a table to be parsed by parse_tables, selected from a document or a file.
+    as elsewhere in the module, bytes and str sources are markup, only os.PathLike ones being paths of files."""
+
+    def __init__(self, source: Union[bytes, str, os.PathLike], selector: Optional[str] = None, index: int = 0,
+                 settings: Dict[str, dict] = None) -> None:
+        """
+        :param source: html document, as bytes or str, or path of a file containing it, e.g. a pathlib.Path
+        :param selector: XPath expression selecting tables within the document, by default the first table is taken
+        :param index: which of the selected tables to parse
+        :param settings: keyword arguments of parser methods to call before parsing keyed by their names,
+            e.g. {'skip_rows': {'last': 4}, 'header_rows': {'first': 3}}
+        """
+        self.source: Union[bytes, str, os.PathLike] = source
+        self.selector: Optional[str] = selector
+        self.index: int = index
+        self.settings: Dict[str, dict] = settings or {}
+
+    def parse(self) -> pd.DataFrame:
+        if isinstance(self.source, os.PathLike):
+            markup: Union[bytes, str] = pathlib.Path(self.source).read_bytes()
+        elif isinstance(self.source, (bytes, str)):
+            markup = self.source
+        else:
+            raise TypeError(f'source has to be markup or a path, not {type(self.source).__name__}')
+        parser = WebTableParser(LxmlTableBackend.fromstring(markup, self.selector, self.index))
+        for method, arguments in self.settings.items():
+            getattr(parser, method)(**arguments)
+        return parser.parse()
+
+
+class TableResult:
+    def __init__(self, frame: Optional[pd.DataFrame] = None, error: Optional[str] = None) -> None:
+        """
+        :param error: exception raised parsing the table, formatted
+        """
+        self.frame: Optional[pd.DataFrame] = frame
+        self.error: Optional[str] = error
+
+
+def parse_tables(jobs: Iterable[TableJob], processes: Optional[int] = None, chunksize: int = 1) -> List[TableResult]:
+    """parses the tables in a pool of processes, each of them reading and parsing the documents itself.
+
+    :param processes: size of the pool, by default the number of processors; with a single one no pool is started
+    :param chunksize: number of jobs sent to a process at once
+    :return: results in the order of the jobs, failing jobs having their errors instead of frames
+    """
+    if processes == 1:
+        return list(map(_parse_job, jobs))
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(_parse_job, jobs, chunksize=chunksize))
+
+
+def _parse_job(job: TableJob) -> TableResult:
+    try:
+        return TableResult(frame=job.parse())
+    except Exception as error:
+        # exceptions are passed formatted as not all of them survive pickling
+        return TableResult(error=''.join(traceback.format_exception_only(type(error), error)).strip())
 
 
 table_parser = diProviders.Factory(
@@ -0,0 +1,114 @@
+"""benchmarks of iter_records over the backends, on the PRG sample replicated to documents of various sizes.
+
+run as a script, e.g. python test/benchmark_sax_handlers.py --count 5
+for every document the run-times of extracting the addresses with each backend are compared,
+followed by the throughput in records per second and the peak memory allocated by a single pass."""
+
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from typing import Callable, List
+
+repository_path: pathlib.Path = pathlib.Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(repository_path), str(repository_path / 'performance')]
+
+from sax_handlers import RecordSpec, iter_records, iter_records_parallel
+from comparator import PerformanceComparator
+
+sample_path: pathlib.Path = pathlib.Path(__file__).parent / 'samplefile.xml'
+
+address_spec: RecordSpec = RecordSpec('address', 'prg-ad:PRG_PunktAdresowy', {
+    'city': 'prg-ad:miejscowosc',
+    'street': 'prg-ad:ulica',
+    'street_number': 'prg-ad:numerPorzadkowy',
+    'post_code': 'prg-ad:kodPocztowy',
+    'position': 'prg-ad:pozycja/Point/pos'
+})
+
+
+class BenchmarkDocument:
+    """the sample with its records repeated to the given count, written to a temporary file."""
+
+    def __init__(self, record_count: int, directory: str) -> None:
+        lines: List[str] = sample_path.read_text(encoding='utf-8-sig').split('\n')
+        opening: int = next(index for index, line in enumerate(lines) if 'PRG_PunktAdresowy' in line)
+        closing: int = max(index for index, line in enumerate(lines) if 'PRG_PunktAdresowy' in line)
+        records: List[str] = lines[opening:closing + 1]
+
+        self.description: str = f'{record_count:,}'
+        self.record_count: int = record_count
+        self.path: str = os.path.join(directory, f'prg_{record_count}.xml')
+        with open(self.path, 'w', encoding='utf-8') as document:
+            document.write('\n'.join(lines[:opening]) + '\n')
+            for _ in range(record_count // 2):
+                document.write('\n'.join(records) + '\n')
+            document.write('\n'.join(lines[closing + 1:]))
+
+    @property
+    def value(self) -> 'BenchmarkDocument':
+        return self
+
+
+def extract_sax(document: BenchmarkDocument) -> int:
+    """sax"""
+    return sum(1 for _ in iter_records(document.path, address_spec, backend='sax'))
+
+
+def extract_expat(document: BenchmarkDocument) -> int:
+    """expat"""
+    return sum(1 for _ in iter_records(document.path, address_spec, backend='expat'))
+
+
+def extract_lxml(document: BenchmarkDocument) -> int:
+    """lxml"""
+    return sum(1 for _ in iter_records(document.path, address_spec, backend='lxml'))
+
+
+def extract_parallel(document: BenchmarkDocument) -> int:
+    """parallel"""
+    return sum(1 for _ in iter_records_parallel(document.path, address_spec, split_size=2**20))
+
+
+def print_throughput(functions: List[Callable], documents: List[BenchmarkDocument],
+                     timings: List[List[float]]) -> None:
+    print(f'| {"records":>9} | {"backend":>8} | {"records/s":>10} | {"peak memory":>12} |')
+    for document, document_timings in zip(documents, timings):
+        for function, timing in zip(functions, document_timings):
+            print(f'| {document.description:>9} | {function.__doc__:>8} | {document.record_count / timing:10.3e} '
+                  f'| {measure_peak_memory(function, document) / 2**20:10.2f}MB |')
+
+
+def measure_peak_memory(function: Callable, document: BenchmarkDocument) -> int:
+    tracemalloc.start()
+    try:
+        function(document)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(record_counts: List[int], count: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        documents: List[BenchmarkDocument] = [BenchmarkDocument(records, directory) for records in record_counts]
+        comparator = PerformanceComparator([extract_sax, extract_expat, extract_lxml, extract_parallel],
+                                           documents, count)
+        comparator.print()
+        print()
+        print_throughput(comparator.get_functions(), documents, comparator.get_results())
+
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--count', type=int, default=3, help='number of passes over every document')
+    argument_parser.add_argument('--records', type=int, nargs='+', default=[1000, 10000, 100000],
+                                 help='numbers of records of the documents')
+    arguments = argument_parser.parse_args()
+
+    started: float = time.perf_counter()
+    run(arguments.records, arguments.count)
+    print(f'\nfinished in {time.perf_counter() - started:.1f}s')
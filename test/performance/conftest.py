@@ -0,0 +1,5 @@
+import pathlib
+import sys
+
+# the modules of the performance package import one another by their bare names
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[2] / 'performance'))
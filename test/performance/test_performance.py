@@ -0,0 +1,237 @@
+import itertools
+import math
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from argument import RegularTimedArgument, VacuousTimedArgument
+from interleaved_runner import InterleavedRunner
+from isolated_runner import IsolatedRunner
+from measurement import PerformanceMeasurement
+from memory_usage import measure_memory
+from performance_types import Timer
+from printer import PerformancePrinter
+from sample_statistics import SampleStatistics, bootstrap_ratio_interval, is_significantly_slower
+from timer import BatchTimer
+
+
+class ScriptedTimer(Timer):
+    """timer taking the seconds of every batch from what the call returns, the batches being of a single call."""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+
+    def calibrate(self, empty_call):
+        return 0.
+
+    def plan(self, call, count=None):
+        return 1, count or self.repeat
+
+    def sample(self, call, overhead, batch):
+        return call()
+
+    def measure(self, call, overhead, count=None):
+        return self.measure_planned(call, overhead, *self.plan(call, count))
+
+    def measure_planned(self, call, overhead, batch, repeat):
+        return [self.sample(call, overhead, batch) for _ in range(repeat)]
+
+
+class DriftingTimer(ScriptedTimer):
+    """scripted timer whose machine slows down by the seconds of a call with every two samples taken,
+    the calls being measured the given numbers of times."""
+
+    def __init__(self, repeats):
+        super().__init__(None)
+        self.repeats = repeats
+        self.taken = 0
+
+    def plan(self, call, count=None):
+        return 1, self.repeats[call]
+
+    def sample(self, call, overhead, batch):
+        self.taken += 1
+        return call() * (1 + (self.taken - 1) // 2)
+
+
+def scripted(*seconds):
+    cycle = itertools.cycle(seconds)
+    return lambda: next(cycle)
+
+
+def seconds_given(seconds):
+    return seconds
+
+
+def twice_seconds_given(seconds):
+    return 2 * seconds
+
+
+def failing(seconds):
+    raise ValueError(seconds)
+
+
+def sleeping(seconds):
+    time.sleep(60)
+
+
+def faster():
+    return 1.
+
+
+def slower():
+    return 1.2
+
+
+def lowest_cpu(seconds):
+    return float(min(os.sched_getaffinity(0)))
+
+
+class TestBatchTimer:
+
+    def test_splitting_given_count_into_batches(self):
+        timer = BatchTimer(minimal_batch_time=.001)
+        assert timer.plan(lambda: None, 1000) == (200, 5)
+        assert timer.plan(lambda: None, 3) == (1, 3)
+
+    def test_flooring_calls_faster_than_overhead_at_resolution(self):
+        timer = BatchTimer()
+        assert timer.sample(lambda: None, overhead=1e9, batch=10) == timer.resolution / 10 / 1e9 > 0
+
+
+class TestSampleStatistics:
+
+    faster = SampleStatistics([1.0, 1.1, 0.9, 1.0, 1.05])
+    slower = SampleStatistics([2.0, 2.1, 1.9, 2.0, 2.05])
+    alike = SampleStatistics([1.02, 1.08, 0.95, 1.01, 1.0])
+
+    def test_quartiles_and_outlier_rejection(self):
+        sample_statistics = SampleStatistics([1, 2, 3, 4, 5, 6, 7, 100])
+        assert (sample_statistics.first_quartile, sample_statistics.median, sample_statistics.third_quartile) == \
+               (2.25, 4.5, 6.75)
+        assert list(sample_statistics.kept) == [1, 2, 3, 4, 5, 6, 7]
+        assert sample_statistics.outliers == 1
+        assert sample_statistics.mean == 4.
+        assert sample_statistics.minimum == 1
+
+    def test_bootstrap_interval_around_mean(self):
+        sample_statistics = SampleStatistics([1, 2, 3, 4, 5, 6, 7, 100])
+        low, high = sample_statistics.bootstrap_interval()
+        assert 1 < low < sample_statistics.mean < high < 7
+        assert sample_statistics.bootstrap_interval() == (low, high)
+
+    def test_bootstrap_ratio_interval(self):
+        low, high = bootstrap_ratio_interval(self.slower, self.faster)
+        assert 1.8 < low < 2 < high < 2.2
+
+    def test_significance_verdict(self):
+        assert is_significantly_slower(self.slower, self.faster) is True
+        assert is_significantly_slower(self.alike, self.faster) is False
+        assert is_significantly_slower(self.faster, self.slower) is False
+        assert is_significantly_slower(self.slower, SampleStatistics([1.])) is None
+
+    def test_no_verdict_on_means_of_zero(self):
+        zero = SampleStatistics([0., 0., 0.])
+        assert is_significantly_slower(zero, zero) is None
+        assert is_significantly_slower(self.slower, zero) is None
+        assert is_significantly_slower(zero, self.faster) is None
+
+
+class TestPerformanceMeasurement:
+
+    def test_early_stopping_once_ordering_settled(self):
+        functions = [scripted(1.0, 1.1, 0.9, 1.05), scripted(2.0, 2.1, 1.9, 2.05)]
+        measurement = PerformanceMeasurement(functions, VacuousTimedArgument(), timer=ScriptedTimer(100),
+                                             early_stopping=True)
+        assert [len(samples) for samples in measurement.get_samples()] == [5, 5]
+        assert measurement.get_significance() == [False, True]
+
+    def test_measuring_all_rounds_while_ordering_unsettled(self):
+        functions = [scripted(1.0, 1.1, 0.9, 1.05), scripted(1.05, 0.9, 1.1, 1.0)]
+        measurement = PerformanceMeasurement(functions, VacuousTimedArgument(), timer=ScriptedTimer(20),
+                                             early_stopping=True)
+        assert [len(samples) for samples in measurement.get_samples()] == [20, 20]
+
+    def test_unresolved_ratios_to_fastest_taking_no_time(self, capsys):
+        measurement = PerformanceMeasurement([scripted(0.), scripted(1.)], VacuousTimedArgument(),
+                                             timer=ScriptedTimer(5))
+        assert measurement.get_ratios()[0] == 0. and math.isnan(measurement.get_ratios()[1])
+        measurement.print(PerformancePrinter())
+        assert '?' in capsys.readouterr().out.split('|')[1]
+        assert measurement.get_significance() == [False, None]
+
+    def test_unknown_significance_of_single_batch(self):
+        measurement = PerformanceMeasurement([scripted(1.), scripted(2.)], VacuousTimedArgument(),
+                                             timer=ScriptedTimer(1))
+        assert measurement.get_significance() == [False, None]
+        assert measurement.get_results() == [1., 2.]
+
+
+class TestIsolatedRunner:
+
+    arguments = [RegularTimedArgument(1.), RegularTimedArgument(3.)]
+
+    def test_samples_of_every_function_and_argument(self):
+        samples = IsolatedRunner(processes=2).run([seconds_given, twice_seconds_given], self.arguments, None,
+                                                  ScriptedTimer(3))
+        assert [[list(function_samples) for function_samples in row] for row in samples] == [
+            [[1.] * 3, [2.] * 3], [[3.] * 3, [6.] * 3]
+        ]
+
+    def test_spawning_where_processes_cannot_be_forked(self, monkeypatch):
+        monkeypatch.setattr(multiprocessing, 'get_all_start_methods', lambda: ['spawn'])
+        samples = IsolatedRunner(processes=2).run([seconds_given], self.arguments, None, ScriptedTimer(2))
+        assert [list(row[0]) for row in samples] == [[1.] * 2, [3.] * 2]
+
+    def test_terminating_measurements_once_one_failed(self):
+        started = time.perf_counter()
+        with pytest.raises(RuntimeError, match='ValueError'):
+            IsolatedRunner(processes=2).run([failing, sleeping], self.arguments, None, ScriptedTimer(1))
+        assert time.perf_counter() - started < 30
+        assert multiprocessing.active_children() == []
+
+    @pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason='cpus cannot be pinned on the platform')
+    def test_pinning_processes_to_cpus(self):
+        cpu = max(os.sched_getaffinity(0))
+        samples = IsolatedRunner(cpus=[cpu]).run([lowest_cpu], self.arguments, None, ScriptedTimer(1))
+        assert [list(row[0]) for row in samples] == [[float(cpu)], [float(cpu)]]
+
+
+class TestInterleavedRunner:
+
+    def test_block_ratios_cancelling_drift(self):
+        # the faster function measured in later blocks too, its mean being inflated by the drift
+        timer = DriftingTimer({faster: 20, slower: 5})
+        runner = InterleavedRunner(seed=0)
+        samples = runner.run([faster, slower], [VacuousTimedArgument()], None, timer)
+        assert [len(block) for block in runner.get_blocks()[0]] == [20, 5]
+        measurement = PerformanceMeasurement([faster, slower], VacuousTimedArgument(), samples=samples[0],
+                                             blocks=runner.get_blocks()[0])
+        assert measurement.get_results()[0] > measurement.get_results()[1]
+        assert measurement.get_indices_sorted_by_timings() == [0, 1]
+        assert measurement.get_ratios() == pytest.approx([0., 20.])
+
+
+class TestMemoryUsage:
+
+    def test_allocations_held_by_result(self):
+        usage = measure_memory(lambda: [None] * 100000)
+        assert usage.peak >= usage.net >= 100000 * 8
+        assert usage.blocks >= 1
+
+    def test_allocations_released_within_call(self):
+        usage = measure_memory(lambda: len([None] * 100000))
+        assert usage.peak >= 100000 * 8
+        assert usage.net < 1000
+
+    def test_counting_blocks_allocated(self):
+        assert measure_memory(lambda: [[] for _ in range(1000)]).blocks >= 1000
+        assert measure_memory(lambda: None).blocks == 0
+
+    def test_memory_column(self):
+        printer = PerformancePrinter(memory=True)
+        assert printer.get_memory_format().format(printer.format_size(2048), printer.format_size(-10), 7,
+                                                  printer.format_size(None)) == \
+               '    2.0kB     -10B        7        - |'
@@ -0,0 +1,197 @@
+"""benchmarks of WebTableParser over synthetic tables of various shapes and over the cached pages.
+
+run as a script, e.g. python test/table_parser/benchmark.py --count 5
+for every table the run-times of parse and iter_rows with the soup and the lxml backend are compared,
+the soup and the lxml element being built beforehand, followed by the throughput in cells per second
+and the peak memory allocated by a single parse. the run-times of parsing the markup end to end,
+building the tree included, are compared separately."""
+
+import argparse
+import pathlib
+import random
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+from typing import Callable, List
+
+repository_path: pathlib.Path = pathlib.Path(__file__).resolve().parents[2]
+sys.path[:0] = [str(repository_path), str(repository_path / 'performance')]
+
+from table_parser import WebTableParser, TableIndex, LxmlTableBackend
+from comparator import PerformanceComparator
+
+
+class BenchmarkTable:
+    """a table prepared in each of the forms the parser takes, with the parser settings to apply."""
+
+    def __init__(self, description: str, markup: str, configure: Callable = lambda parser: parser) -> None:
+        self.description: str = description
+        self.markup: str = markup
+        self.soup = BeautifulSoup(markup, 'html.parser').find('table')
+        self.element = LxmlTableBackend.fromstring(markup)
+        self.configure: Callable = configure
+        self.cell_count: int = len(self.soup.find_all(['td', 'th']))
+
+    @property
+    def value(self) -> 'BenchmarkTable':
+        return self
+
+
+def synthetic_table(rows: int, columns: int, rowspan_density: float = 0., colspan_density: float = 0.,
+                    header_rows: int = 1, seed: int = 0) -> str:
+    """
+    :param rowspan_density: probability of a data cell spanning several rows
+    :param colspan_density: probability of a data cell spanning several columns
+    :param header_rows: number of header rows, all but the last one grouping the columns in pairs
+    """
+    generator = random.Random(seed)
+    markup: List[str] = ['<table>']
+
+    for header_row in range(header_rows):
+        markup.append('<tr>')
+        if header_row == 0:
+            markup.append(f'<th rowspan="{header_rows}">index</th>')
+        if header_row < header_rows - 1:
+            markup.extend(f'<th colspan="2">group {group}</th>' for group in range((columns - 1) // 2))
+            markup.extend('<th>single</th>' for _ in range((columns - 1) % 2))
+        else:
+            markup.extend(f'<th>column {column}</th>' for column in range(columns - 1))
+        markup.append('</tr>')
+
+    # rows below still occupied by a rowspan, per column
+    occupied: List[int] = [0] * columns
+    for row in range(rows):
+        markup.append('<tr>')
+        column: int = 0
+        while column < columns:
+            if occupied[column]:
+                occupied[column] -= 1
+                column += 1
+                continue
+            free: int = next((width for width in range(1, columns - column) if occupied[column + width]), columns - column)
+            colspan: int = generator.randint(2, min(free, 3)) if free > 1 and generator.random() < colspan_density else 1
+            rowspan: int = generator.randint(2, min(rows - row, 4)) if rows - row > 1 and generator.random() < rowspan_density else 1
+            markup.append(f'<td rowspan="{rowspan}" colspan="{colspan}">{row * columns + column:,}</td>')
+            for spanned in range(column, column + colspan):
+                occupied[spanned] = rowspan - 1
+            column += colspan
+        markup.append('</tr>')
+
+    markup.append('</table>')
+    return ''.join(markup)
+
+
+def synthetic_tables() -> List[BenchmarkTable]:
+    return [
+        BenchmarkTable('1000x10', synthetic_table(1000, 10)),
+        BenchmarkTable('100x100', synthetic_table(100, 100)),
+        BenchmarkTable('5000x10', synthetic_table(5000, 10)),
+        BenchmarkTable('rowspans', synthetic_table(1000, 20, rowspan_density=.2)),
+        BenchmarkTable('colspans', synthetic_table(1000, 20, colspan_density=.2),
+                       lambda parser: parser.expand_colspans()),
+        BenchmarkTable('spans', synthetic_table(1000, 20, rowspan_density=.1, colspan_density=.1),
+                       lambda parser: parser.expand_colspans()),
+        BenchmarkTable('headers', synthetic_table(1000, 20, header_rows=3)),
+    ]
+
+
+def cached_tables() -> List[BenchmarkTable]:
+    resources_path: pathlib.Path = pathlib.Path(__file__).parent / 'resources'
+
+    def select(page: str, position: int = 0, **conditions) -> str:
+        index = TableIndex((resources_path / f'{page}.html').read_bytes())
+        return index.markup(index.find_all(**conditions)[position])
+
+    return [
+        BenchmarkTable('daily', select('daily', id='main_table_countries')),
+        BenchmarkTable('italy', select('italy', class_='wikitable')),
+        BenchmarkTable('s. korea', select('south_korea', 4, class_='wikitable'),
+                       lambda parser: parser.skip_rows(last=4)),
+        BenchmarkTable('france', select('france', 1), lambda parser: parser.skip_rows(first=1)),
+        BenchmarkTable('sweden', select('sweden', class_='wikitable'),
+                       lambda parser: parser.header_rows(first=3).skip_rows(last=4)),
+    ]
+
+
+def parse_soup(table: BenchmarkTable):
+    """soup"""
+    return table.configure(WebTableParser(table.soup)).parse()
+
+
+def parse_element(table: BenchmarkTable):
+    """lxml"""
+    return table.configure(WebTableParser(table.element)).parse()
+
+
+def parse_typed(table: BenchmarkTable):
+    """lxml typed"""
+    return table.configure(WebTableParser(table.element)).convert_types().parse()
+
+
+def iterate_soup_rows(table: BenchmarkTable):
+    """soup rows"""
+    return sum(1 for _ in table.configure(WebTableParser(table.soup)).iter_rows())
+
+
+def iterate_element_rows(table: BenchmarkTable):
+    """lxml rows"""
+    return sum(1 for _ in table.configure(WebTableParser(table.element)).iter_rows())
+
+
+def parse_soup_markup(table: BenchmarkTable):
+    """soup end to end"""
+    return table.configure(WebTableParser(BeautifulSoup(table.markup, 'html.parser').find('table'))).parse()
+
+
+def parse_markup(table: BenchmarkTable):
+    """lxml end to end"""
+    return table.configure(WebTableParser(table.markup)).parse()
+
+
+def print_throughput(functions: List[Callable], tables: List[BenchmarkTable], timings: List[List[float]]) -> None:
+    print(f'| {"table":>9} | {"function":>12} | {"cells/s":>10} | {"peak memory":>12} |')
+    for table, table_timings in zip(tables, timings):
+        for function, timing in zip(functions, table_timings):
+            print(f'| {table.description[:9]:>9} | {function.__doc__:>12} | {table.cell_count / timing:10.3e} '
+                  f'| {measure_peak_memory(function, table) / 2**20:10.2f}MB |')
+
+
+def measure_peak_memory(function: Callable, table: BenchmarkTable) -> int:
+    tracemalloc.start()
+    try:
+        function(table)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(tables: List[BenchmarkTable], count: int) -> None:
+    comparator = PerformanceComparator([parse_soup, parse_element, parse_typed, iterate_soup_rows,
+                                        iterate_element_rows], tables, count)
+    comparator.print()
+    print()
+    parse_functions: List[Callable] = [function for function in comparator.get_functions()
+                                       if function in (parse_soup, parse_element, parse_typed)]
+    parse_timings: List[List[float]] = [[timing for function, timing in zip(comparator.get_functions(), timings)
+                                         if function in parse_functions] for timings in comparator.get_results()]
+    print_throughput(parse_functions, tables, parse_timings)
+    print()
+    PerformanceComparator([parse_soup_markup, parse_markup], tables, count).print()
+
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--count', type=int, default=3, help='number of parses of every table')
+    argument_parser.add_argument('--synthetic', action='store_true', help='only the synthetic tables')
+    argument_parser.add_argument('--cached', action='store_true', help='only the cached pages')
+    arguments = argument_parser.parse_args()
+
+    started: float = time.perf_counter()
+    if not arguments.cached:
+        run(synthetic_tables(), arguments.count)
+        print()
+    if not arguments.synthetic:
+        run(cached_tables(), arguments.count)
+    print(f'\nfinished in {time.perf_counter() - started:.1f}s')
@@ -1,7 +1,8 @@
 import pytest
 
 from tests.mocks.table import get_cached_daily_table, get_cached_italy_table, get_cached_south_korea_table, \
-    get_cached_france_table, get_cached_spain_table, get_cached_sweden_table
+    get_cached_france_table, get_cached_spain_table, get_cached_sweden_table, get_cached_daily_table_element, \
+    get_cached_daily_table_markup, get_cached_sweden_table_element, get_cached_sweden_page
 
 
 @pytest.fixture
@@ -32,3 +33,23 @@ def mock_spain_table():
 @pytest.fixture
 def mock_sweden_table():
     return get_cached_sweden_table()
+
+
+@pytest.fixture
+def mock_simple_table_element():
+    return get_cached_daily_table_element()
+
+
+@pytest.fixture
+def mock_simple_table_markup():
+    return get_cached_daily_table_markup()
+
+
+@pytest.fixture
+def mock_sweden_table_element():
+    return get_cached_sweden_table_element()
+
+
+@pytest.fixture
+def mock_sweden_page():
+    return get_cached_sweden_page()
@@ -1,4 +1,5 @@
 from bs4 import BeautifulSoup
+import lxml.html
 
 import pathlib
 
@@ -33,3 +34,22 @@ def get_cached_spain_table():
 def get_cached_sweden_table():
     page_path: pathlib.Path = pathlib.Path('tests/resources/sweden.html')
     return BeautifulSoup(page_path.open('rb').read(), 'html.parser').find_all('table', {'class': 'wikitable'})[0]
+
+
+def get_cached_daily_table_element():
+    page_path: pathlib.Path = pathlib.Path('tests/resources/daily.html')
+    return lxml.html.fromstring(page_path.open('rb').read()).xpath('//table[@id=$id]', id='main_table_countries')[0]
+
+
+def get_cached_daily_table_markup():
+    return lxml.html.tostring(get_cached_daily_table_element())
+
+
+def get_cached_sweden_table_element():
+    page_path: pathlib.Path = pathlib.Path('tests/resources/sweden.html')
+    return lxml.html.fromstring(page_path.open('rb').read()).find_class('wikitable')[0]
+
+
+def get_cached_sweden_page():
+    page_path: pathlib.Path = pathlib.Path('tests/resources/sweden.html')
+    return page_path.open('rb').read()
@@ -1,4 +1,10 @@
-from table_parser import table_parser
+import json
+import pathlib
+import pandas as pd
+import pytest
+
+from table_parser import table_parser, SpanGrid, ColumnConverter, TablePlan, TableJob, parse_tables, \
+    TableIndex, ParseCache
 
 
 class TestWebTableParser:
@@ -49,3 +55,211 @@ class TestWebTableParser:
         parser = table_parser(mock_sweden_table).header_rows(first=3).skip_rows(last=4)
         parsed_table = parser.parse()
         assert parsed_table.iloc[-1][0] == '3'
+
+    def test_data_colspan_expanding(self, mock_table_with_legend):
+        parser = table_parser(mock_table_with_legend).skip_rows(first=1).expand_colspans()
+        parsed_table = parser.parse()
+        assert parsed_table.iloc[1].name == '24 janvier 2020'
+        assert parsed_table.iloc[1][0] == '24 janvier 2020'
+        assert parsed_table.iloc[1][2] == '3'
+
+    def test_rows_iterating(self, mock_sweden_table):
+        parser = table_parser(mock_sweden_table).header_rows(first=3).skip_rows(last=4)
+        rows = list(parser.iter_rows())
+        assert len(rows) == 35
+        assert rows[-1][1] == '3'
+
+    def test_chunks_iterating(self, mock_sweden_table):
+        parser = table_parser(mock_sweden_table).header_rows(first=3).skip_rows(last=4)
+        chunks = list(parser.iter_chunks(10))
+        assert [len(chunk) for chunk in chunks] == [10, 10, 10, 5]
+        assert pd.concat(chunks).equals(parser.parse())
+
+    def test_chunks_of_short_rows(self, mock_compound_header_table, mock_table_with_legend):
+        for table in (mock_compound_header_table, mock_table_with_legend):
+            assert pd.concat(table_parser(table).iter_chunks(1)).equals(table_parser(table).parse())
+
+    def test_type_converting(self, mock_simple_table):
+        parser = table_parser(mock_simple_table).convert_types()
+        parsed_table = parser.parse()
+        assert parsed_table['TotalCases'].dtype == 'int32'
+        assert parsed_table.loc['China', 'TotalCases'] == 80815
+        assert parsed_table['NewCases'].isna().any()
+        assert parsed_table.loc['Iran', 'NewCases'] == 1289
+
+    def test_arrow_parsing(self, mock_simple_table):
+        pytest.importorskip('pyarrow')
+        parsed_table = table_parser(mock_simple_table).convert_types().parse_arrow()
+        assert parsed_table.num_rows == 138
+        assert parsed_table.column_names[:2] == ['Country,Other', 'TotalCases']
+        assert parsed_table.column('TotalCases')[0].as_py() == 80815
+
+    def test_plan_applying(self, mock_sweden_table):
+        planned_parser = table_parser(mock_sweden_table).header_rows(first=3).skip_rows(last=4)
+        plan = TablePlan.from_dict(json.loads(json.dumps(planned_parser.plan().to_dict())))
+        parser = table_parser(mock_sweden_table).apply_plan(plan)
+        assert parser.parse().equals(planned_parser.parse())
+        assert parser.plan_matched
+
+    def test_plan_mismatching(self, mock_simple_table, mock_sweden_table):
+        plan = table_parser(mock_sweden_table).header_rows(first=3).plan()
+        parser = table_parser(mock_simple_table).apply_plan(plan).header_rows()
+        assert parser.parse().columns[1] == 'NewCases'
+        assert not parser.plan_matched
+
+    def test_incremental_parsing(self, mock_simple_table_element):
+        snapshot = table_parser(mock_simple_table_element).parse_incremental()
+        mock_simple_table_element.xpath('.//td')[50].text = '1'
+        updated_snapshot = table_parser(mock_simple_table_element).parse_incremental(snapshot)
+        assert updated_snapshot.frame.equals(table_parser(mock_simple_table_element).parse())
+        assert updated_snapshot.changed_rows == [5]
+        assert updated_snapshot.removed_rows == [5]
+
+    def test_incremental_parsing_of_soup(self, mock_simple_table):
+        snapshot = table_parser(mock_simple_table).parse_incremental()
+        mock_simple_table.find_all('td')[50].string = '1'
+        updated_snapshot = table_parser(mock_simple_table).parse_incremental(snapshot)
+        assert updated_snapshot.frame.equals(table_parser(mock_simple_table).parse())
+        assert updated_snapshot.changed_rows == [5]
+        assert updated_snapshot.removed_rows == [5]
+
+    def test_incremental_rowspans(self, mock_sweden_table):
+        snapshot = table_parser(mock_sweden_table).header_rows(first=3).parse_incremental()
+        rowspanning_cell = next(cell for cell in mock_sweden_table.find_all('td') if cell.attrs.get('rowspan'))
+        rowspanning_cell.string = 'changed'
+        updated_snapshot = table_parser(mock_sweden_table).header_rows(first=3).parse_incremental(snapshot)
+        assert updated_snapshot.frame.equals(table_parser(mock_sweden_table).header_rows(first=3).parse())
+        assert len(updated_snapshot.changed_rows) == int(rowspanning_cell.attrs['rowspan'])
+
+
+class TestColumnConverter:
+    def test_integers(self):
+        converted = ColumnConverter().convert(['1,234', '300[a]', '', None])
+        assert converted.dtype == 'Int16'
+        assert converted.tolist() == [1234, 300, pd.NA, pd.NA]
+
+    def test_floats(self):
+        converted = ColumnConverter().convert(['12.5%', '7'])
+        assert converted.tolist() == [12.5, 7.0]
+
+    def test_dates(self):
+        converted = ColumnConverter().convert(['2020-03-01', '2020-03-02[1]'])
+        assert converted.dt.day.tolist() == [1, 2]
+
+    def test_categories(self):
+        assert ColumnConverter().convert(['a', 'b', 'a', 'a']).dtype == 'category'
+        assert ColumnConverter().convert(['a', 'b', 'c']).dtype == object
+
+
+class TestLxmlTableBackend:
+    def test_element_parsed_as_soup(self, mock_simple_table, mock_simple_table_element):
+        parsed_table = table_parser(mock_simple_table_element).parse()
+        assert parsed_table.equals(table_parser(mock_simple_table).parse())
+
+    def test_markup_parsed_as_soup(self, mock_simple_table, mock_simple_table_markup):
+        parsed_table = table_parser(mock_simple_table_markup).parse()
+        assert parsed_table.equals(table_parser(mock_simple_table).parse())
+
+    def test_rowspans_parsed_as_soup(self, mock_sweden_table, mock_sweden_table_element):
+        parsed_table = table_parser(mock_sweden_table_element).header_rows(first=3).skip_rows(last=4).parse()
+        assert parsed_table.equals(table_parser(mock_sweden_table).header_rows(first=3).skip_rows(last=4).parse())
+
+    def test_cells_with_and_without_children(self):
+        markup = '<table><tr><th>i</th><th>a</th><th>b</th><th>c</th></tr>' \
+                 '<tr><td> 1 </td><td>x<b>y</b>z</td><td>p<!-- c -->q</td><td>s<script>t</script></td></tr></table>'
+        assert table_parser(markup).parse().iloc[0].tolist() == ['xyz', 'pq', 's']
+
+
+class TestParseCache:
+    def test_memory_hits(self, mock_simple_table_markup):
+        cache = ParseCache()
+        parsed_table = table_parser(mock_simple_table_markup).cache(cache).parse()
+        parsed_table.iloc[0, 0] = 'modified'
+        assert table_parser(mock_simple_table_markup).cache(cache).parse().iloc[0, 0] == '80,815'
+        assert table_parser(mock_simple_table_markup).skip_rows(first=1).cache(cache).parse().shape == (137, 8)
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_disk_hits(self, mock_sweden_table, tmp_path):
+        pytest.importorskip('pyarrow')
+        parser = table_parser(mock_sweden_table).header_rows(first=3).convert_types()
+        parsed_table = parser.cache(ParseCache(directory=tmp_path)).parse()
+        cache = ParseCache(directory=tmp_path)
+        assert parser.cache(cache).parse().equals(parsed_table)
+        assert (cache.disk_hits, cache.misses) == (1, 0)
+
+    def test_plans_kept_apart(self, mock_simple_table_markup):
+        cache = ParseCache()
+        plan = table_parser(mock_simple_table_markup).plan()
+        plan.header = [f'planned {column}' for column in plan.header]
+        assert table_parser(mock_simple_table_markup).cache(cache).parse().columns[0] == 'TotalCases'
+        for _ in range(2):
+            parser = table_parser(mock_simple_table_markup).apply_plan(plan).cache(cache)
+            assert parser.parse().columns[0] == 'planned TotalCases'
+            assert parser.plan_matched
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_memory_bounded(self, mock_simple_table_markup):
+        cache = ParseCache(max_bytes=100000)
+        for first in range(3):
+            table_parser(mock_simple_table_markup).skip_rows(first=first).cache(cache).parse()
+        assert cache.statistics()['frames'] == 1
+        assert cache.statistics()['bytes'] <= 100000
+
+    def test_bytes_held_by_frame(self, mock_simple_table_markup):
+        cache = ParseCache()
+        parsed_table = table_parser(mock_simple_table_markup).cache(cache).parse()
+        assert cache.statistics()['bytes'] == parsed_table.memory_usage(deep=True).sum()
+
+
+class TestTableIndex:
+    def test_tables_found(self, mock_sweden_page):
+        index = TableIndex(mock_sweden_page)
+        assert len(index.tables) == 32
+        assert index.find_all(class_='wikitable')[0].caption.startswith('New COVID-19 cases in Sweden by county')
+
+    def test_table_markup_parsed_as_page(self, mock_sweden_page, mock_sweden_table):
+        index = TableIndex(mock_sweden_page)
+        parser = table_parser(index.markup(index.find_all(class_='wikitable')[0])).header_rows(first=3).skip_rows(last=4)
+        assert parser.parse().equals(table_parser(mock_sweden_table).header_rows(first=3).skip_rows(last=4).parse())
+
+
+class TestParseTables:
+    jobs = [
+        TableJob(pathlib.Path('tests/resources/daily.html'), '//table[@id="main_table_countries"]'),
+        TableJob(pathlib.Path('tests/resources/sweden.html'), '//table[contains(@class, "wikitable")]',
+                 settings={'header_rows': {'first': 3}, 'skip_rows': {'last': 4}}),
+        TableJob(pathlib.Path('tests/resources/sweden.html'), '//table[@id="missing"]'),
+    ]
+
+    def test_parsing_in_order(self, mock_simple_table, mock_sweden_table):
+        results = parse_tables(self.jobs, processes=2)
+        assert results[0].frame.equals(table_parser(mock_simple_table).parse())
+        assert results[1].frame.equals(table_parser(mock_sweden_table).header_rows(first=3).skip_rows(last=4).parse())
+
+    def test_errors_kept(self):
+        results = parse_tables(self.jobs, processes=1)
+        assert results[2].frame is None
+        assert results[2].error.startswith('IndexError')
+
+    def test_inline_markup_job(self, mock_simple_table_markup):
+        results = parse_tables([TableJob(mock_simple_table_markup.decode()), TableJob(12)], processes=1)
+        assert results[0].frame.equals(table_parser(mock_simple_table_markup).parse())
+        assert results[1].error.startswith('TypeError')
+
+
+class TestSpanGrid:
+    def test_rowspan_repeated(self):
+        grid = SpanGrid()
+        assert grid.resolve([('a', 2, 1), ('b', 1, 1)]) == ['a', 'b']
+        assert grid.resolve([('c', 1, 1)]) == ['a', 'c']
+
+    def test_rowspan_with_colspan(self):
+        grid = SpanGrid(carried_text='')
+        assert grid.resolve([('a', 1, 1), ('b', 2, 2)]) == ['a', 'b', 'b']
+        assert grid.resolve([('c', 1, 1)]) == ['c', '', '']
+        assert grid.resolve([('d', 1, 1)]) == ['d']
+
+    def test_rowspan_beyond_row_end(self):
+        grid = SpanGrid()
+        assert grid.resolve([('a', 1, 1), ('b', 1, 1), ('c', 2, 1)]) == ['a', 'b', 'c']
+        assert grid.resolve([('d', 1, 1)]) == ['d', None, 'c']
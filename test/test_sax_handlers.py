@@ -1,6 +1,22 @@
+import gzip
+import io
+import logging
+import lzma
+import mmap
+import os
+import zipfile
 import xml.sax
+import xml.sax.handler
 
-from sax_handlers import SingleTagChildrenHandler
+import pandas as pd
+import pytest
+
+from sax_handlers import SingleTagChildrenHandler, PathRecordsHandler, RecordSpec, RecordIndex, BACKENDS, \
+    iter_records, iter_records_parallel, iter_frames, write_records, CsvSink, ParquetSink, \
+    open_document, SubtreeHandler, iter_subtrees, ParseMonitor, \
+    logging_reporter, _split_at_tags
+
+sample_xml = os.path.join(os.path.dirname(__file__), 'samplefile.xml')
 
 
 class TestSingleTagChildrenHandler:
@@ -53,3 +69,286 @@ class TestSingleTagChildrenHandler:
 
         xml.sax.parse(self.sample_xml, handler)
         assert accumulated_results == expected
+
+    def test_fragmented_text_without_callbacks(self):
+        document = '<r><p><c>{0}<x/>ignored</c><c>{0}</c></p><c>outside</c></r>'.format('a&amp;b' * 1000)
+        handler = SingleTagChildrenHandler('p', {'c'}, {})
+
+        xml.sax.parseString(document.encode(), handler)
+        assert handler.get_parsed_child('c') == 'a&b' * 2000 + 'outside'
+
+        handler.clear_content()
+        assert handler.get_parsed_child('c') == ''
+
+
+class TestPathRecordsHandler:
+
+    specs = [
+        RecordSpec('address', 'prg-ad:PRG_PunktAdresowy', {
+            'city': 'prg-ad:miejscowosc',
+            'post_code': 'kodPocztowy',
+            'local_id': 'idIIP/BT_Identyfikator/lokalnyId',
+            'units': 'jednostkaAdmnistracyjna'
+        }, multiple=['units']),
+        RecordSpec('position', '{http://www.opengis.net/gml/3.2}Point', {'position': 'gml:pos'})
+    ]
+
+    expected_addresses = [
+        {
+            'city': 'Borzytuchom',
+            'post_code': '77-141',
+            'local_id': '2b266814-afc0-4435-8fc0-9fc0d75b5e28',
+            'units': ['Polska', 'pomorskie', 'bytowski', 'Borzytuchom']
+        },
+        {
+            'city': 'Borzytuchom',
+            'post_code': '77-141',
+            'local_id': '959bef0a-aa34-447f-964e-cac4a76280d5',
+            'units': ['Polska', 'pomorskie', 'bytowski', 'Borzytuchom']
+        }
+    ]
+
+    def test_extracting_in_single_pass(self):
+        handler = PathRecordsHandler(self.specs)
+        xml.sax.parse(sample_xml, handler)
+        assert handler.get_parsed('address') == self.expected_addresses
+        assert handler.get_parsed('position') == [
+            {'position': '705563.8738 394651.9761'}, {'position': '705283.4627 394775.0149'}
+        ]
+
+    def test_extracting_with_namespaces_feature(self):
+        handler = PathRecordsHandler(self.specs)
+        parser = xml.sax.make_parser()
+        parser.setFeature(xml.sax.handler.feature_namespaces, True)
+        parser.setContentHandler(handler)
+        parser.parse(sample_xml)
+        assert handler.get_parsed('address') == self.expected_addresses
+
+    def test_nested_tags_of_same_name(self):
+        handler = PathRecordsHandler([RecordSpec('item', 'item', {'name': 'name', 'inner_name': 'item/name'})])
+        xml.sax.parseString(b'<r><item><name>a<b>b</b></name><item><name>c</name></item></item></r>', handler)
+        assert handler.get_parsed('item') == [{'name': 'c', 'inner_name': None}, {'name': 'ab', 'inner_name': 'c'}]
+
+    def test_field_nested_in_field_in_compact_document(self):
+        spec = RecordSpec('address', 'PRG_PunktAdresowy', {
+            'identifier': 'idIIP', 'local_id': 'idIIP/BT_Identyfikator/lokalnyId'
+        })
+        document = b'<r><PRG_PunktAdresowy><idIIP><BT_Identyfikator><lokalnyId>x</lokalnyId><wersja></wersja>' \
+                   b'</BT_Identyfikator>y</idIIP></PRG_PunktAdresowy></r>'
+        for backend in BACKENDS:
+            assert list(iter_records(io.BytesIO(document), spec, backend=backend)) == [
+                {'identifier': 'xy', 'local_id': 'x'}
+            ]
+
+
+class TestIterRecords:
+
+    spec = RecordSpec('address', 'PRG_PunktAdresowy', ['miejscowosc', 'numerPorzadkowy'])
+
+    def test_iterating_in_chunks(self):
+        records = iter_records(sample_xml, self.spec, chunk_size=64)
+        assert next(records) == {'miejscowosc': 'Borzytuchom', 'numerPorzadkowy': '13'}
+        assert list(records) == [{'miejscowosc': 'Borzytuchom', 'numerPorzadkowy': '10'}]
+
+    def test_iterating_tuples_of_several_specs(self):
+        specs = [self.spec, RecordSpec('position', 'Point', ['pos'])]
+        assert list(iter_records(sample_xml, specs, as_tuples=True)) == [
+            ('position', ('705563.8738 394651.9761',)),
+            ('address', ('Borzytuchom', '13')),
+            ('position', ('705283.4627 394775.0149',)),
+            ('address', ('Borzytuchom', '10')),
+        ]
+
+    def test_same_records_from_all_backends(self):
+        specs = [
+            RecordSpec('address', 'prg-ad:PRG_PunktAdresowy', ['prg-ad:miejscowosc', 'idIIP', 'pozycja/Point/pos']),
+            RecordSpec('members', 'gml:FeatureCollection', ['gml:featureMembers'])
+        ]
+        expected = list(iter_records(sample_xml, specs, chunk_size=100))
+        for backend in BACKENDS:
+            assert list(iter_records(sample_xml, specs, chunk_size=100, backend=backend)) == expected
+
+    def test_text_around_comments_in_lxml_backend(self):
+        document = io.BytesIO(b'<r><item><name>a<!-- c -->b<?p q?>c<x>d</x>e&amp;</name></item></r>')
+        assert list(iter_records(document, RecordSpec('item', 'item', ['name']), backend='lxml')) == [
+            {'name': 'abcde&'}
+        ]
+
+    def test_parsing_splits_in_parallel(self):
+        spec = RecordSpec('address', 'prg-ad:PRG_PunktAdresowy', ['miejscowosc', 'numerPorzadkowy', 'gml:pos'])
+        expected = list(iter_records(sample_xml, spec))
+        assert list(iter_records_parallel(sample_xml, spec, processes=2, split_size=100)) == expected
+        assert list(iter_records_parallel(sample_xml, spec, processes=1, split_size=100)) == expected
+
+    def test_parsing_splits_of_several_specs_in_parallel(self):
+        specs = [RecordSpec('address', 'prg-ad:PRG_PunktAdresowy', ['miejscowosc']),
+                 RecordSpec('position', 'PRG_PunktAdresowy/pozycja/Point', ['pos'])]
+        assert list(iter_records_parallel(sample_xml, specs, processes=2, split_size=100)) == \
+               list(iter_records(sample_xml, specs))
+
+    def test_rejecting_specs_outside_of_splits(self):
+        specs = [RecordSpec('address', 'prg-ad:PRG_PunktAdresowy', ['miejscowosc']),
+                 RecordSpec('members', 'gml:FeatureCollection', ['gml:featureMembers'])]
+        with pytest.raises(ValueError, match='members'):
+            list(iter_records_parallel(sample_xml, specs, processes=2, split_size=100))
+
+    def test_splitting_at_local_name_of_prefixed_boundary(self):
+        with open(sample_xml, 'rb') as document, mmap.mmap(document.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            assert _split_at_tags(mapped, b'PRG_PunktAdresowy', 100) == \
+                   _split_at_tags(mapped, b'prg-ad:PRG_PunktAdresowy', 100)
+            assert len(_split_at_tags(mapped, b'PRG_PunktAdresowy', 100)) == 2
+        spec = RecordSpec('address', 'PRG_PunktAdresowy', ['miejscowosc', 'numerPorzadkowy'])
+        assert list(iter_records_parallel(sample_xml, spec, processes=2, split_size=100)) == \
+               list(iter_records(sample_xml, spec))
+
+
+class TestRecordIndex:
+
+    spec = RecordSpec('address', 'prg-ad:PRG_PunktAdresowy', {
+        'city': 'miejscowosc', 'number': 'numerPorzadkowy', 'position': 'pozycja/Point/pos'
+    })
+
+    def test_looking_up_records_by_keys(self, tmp_path):
+        with RecordIndex.build(sample_xml, self.spec, ['city', 'number'], tmp_path / 'index.sqlite') as index:
+            assert index.count(city='Borzytuchom') == 2
+            assert index.lookup(city='Borzytuchom', number='10') == [
+                {'city': 'Borzytuchom', 'number': '10', 'position': '705283.4627 394775.0149'}
+            ]
+            assert index.lookup(number='11') == []
+
+        with RecordIndex(tmp_path / 'index.sqlite') as index:
+            offset, length = index.find(number='13')[0]
+            with open(sample_xml, 'rb') as document:
+                document.seek(offset)
+                assert document.read(length).startswith(b'<prg-ad:PRG_PunktAdresowy gml:id=')
+            assert index.lookup() == list(iter_records(sample_xml, self.spec))
+
+    def test_keys_have_to_be_indexed(self, tmp_path):
+        with pytest.raises(ValueError):
+            RecordIndex.build(sample_xml, self.spec, ['street'], tmp_path / 'index.sqlite')
+        with RecordIndex.build(sample_xml, self.spec, ['city'], tmp_path / 'index.sqlite') as index:
+            with pytest.raises(KeyError):
+                index.lookup(number='10')
+
+
+class TestColumnSinks:
+
+    spec = RecordSpec('address', 'prg-ad:PRG_PunktAdresowy', {
+        'city': 'miejscowosc', 'number': 'numerPorzadkowy', 'units': 'jednostkaAdmnistracyjna'
+    }, multiple=['units'])
+
+    expected = pd.DataFrame({
+        'city': pd.Categorical(['Borzytuchom', 'Borzytuchom']),
+        'number': ['13', '10'],
+        'units': [['Polska', 'pomorskie', 'bytowski', 'Borzytuchom']] * 2
+    })
+
+    def test_iterating_frame_batches(self):
+        frames = list(iter_frames(sample_xml, self.spec, batch_size=1, categories=['city']))
+        assert len(frames) == 2
+        pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True), self.expected)
+
+    def test_writing_parquet_and_csv(self, tmp_path):
+        write_records(sample_xml, self.spec, ParquetSink(tmp_path / 'records.parquet', self.spec.fields, batch_size=1,
+                                                         categories=['city'], multiple=self.spec.multiple))
+        parquet = pd.read_parquet(tmp_path / 'records.parquet')
+        assert parquet['city'].dtype == 'category'
+        assert parquet['number'].tolist() == ['13', '10']
+        assert [list(units) for units in parquet['units']] == self.expected['units'].tolist()
+
+        write_records(sample_xml, self.spec, CsvSink(tmp_path / 'records.csv', self.spec.fields, batch_size=1))
+        csv = pd.read_csv(tmp_path / 'records.csv', dtype=str)
+        assert csv[['city', 'number']].values.tolist() == [['Borzytuchom', '13'], ['Borzytuchom', '10']]
+
+
+class TestOpenDocument:
+
+    spec = RecordSpec('address', 'PRG_PunktAdresowy', ['miejscowosc', 'numerPorzadkowy'])
+
+    def test_reading_compressed_documents(self, tmp_path):
+        with open(sample_xml, 'rb') as sample:
+            content = sample.read()
+        (tmp_path / 'sample.xml.gz').write_bytes(gzip.compress(content))
+        (tmp_path / 'sample.xml.xz').write_bytes(lzma.compress(content))
+        with zipfile.ZipFile(tmp_path / 'sample.zip', 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('registry/sample.xml', content)
+            archive.writestr('readme.txt', 'not a document')
+
+        for path in ['sample.xml.gz', 'sample.xml.xz', 'sample.zip', 'sample.zip/registry/sample.xml']:
+            with open_document(tmp_path / path) as document:
+                assert document.read() == content
+            with open_document(tmp_path / path, buffer_size=512, threaded=True) as document:
+                assert document.read(100) == content[:100]
+                assert document.read() == content[100:]
+
+        expected = list(iter_records(sample_xml, self.spec))
+        assert list(iter_records(tmp_path / 'sample.xml.gz', self.spec, chunk_size=64, threaded=True)) == expected
+
+    def test_closing_threaded_reading_early(self):
+        records = iter_records(sample_xml, self.spec, chunk_size=64, threaded=True)
+        assert next(records)['numerPorzadkowy'] == '13'
+        records.close()
+
+
+class TestSubtreeHandler:
+
+    def test_querying_subtrees(self):
+        handler = SubtreeHandler('prg-ad:PRG_PunktAdresowy')
+        xml.sax.parse(sample_xml, handler)
+        first, second = handler.get_parsed()
+
+        assert first.get('gml:id') == 'PL.ZIPIN.2837.EMUiA_30000000000090000015'
+        assert second.findtext('miejscowosc') == 'Borzytuchom'
+        assert second.findtext('prg-ad:numerPorzadkowy') == '10'
+        assert second.findall('jednostkaAdmnistracyjna/text()') == ['Polska', 'pomorskie', 'bytowski', 'Borzytuchom']
+        assert second.findtext('jednostkaAdmnistracyjna[2]') == 'pomorskie'
+        assert second.findtext('.//gml:pos') == '705283.4627 394775.0149'
+        assert second.findall('//Point/@srsDimension') == ['2']
+        assert second.findtext("idIIP/*[przestrzenNazw='PL.PZGIK.200']/lokalnyId") == \
+            '959bef0a-aa34-447f-964e-cac4a76280d5'
+        assert len(second.findall('komponent[@xlink:href]')) == 6
+        assert second.find('ulica[@missing]') is None
+
+    def test_text_and_tails(self):
+        document = b'<r><item id="1">a<b>b<c/>c</b>d</item>e<item id="2"><item>nested</item></item></r>'
+        first, second = iter_subtrees(io.BytesIO(document), 'item', chunk_size=8)
+
+        assert (first.text, first.children[0].text, first.children[0].tail) == ('a', 'b', 'd')
+        assert first.find('b/c').tail == 'c'
+        assert first.text_content() == 'abcd'
+        assert [element.get('id') for element in second.iter('item')] == ['2', None]
+
+
+class TestParseMonitor:
+
+    spec = RecordSpec('address', 'PRG_PunktAdresowy', ['miejscowosc'])
+
+    def test_instrumenting_iterated_records(self):
+        metrics = {}
+        monitor = ParseMonitor(reporter=metrics)
+        for backend in BACKENDS:
+            assert len(list(iter_records(sample_xml, self.spec, chunk_size=1000, backend=backend, monitor=monitor))) == 2
+        assert metrics['bytes'] == 3 * os.path.getsize(sample_xml)
+        assert metrics['elements'] == 3 * 64
+        assert metrics['records'] == 3 * 2
+        assert metrics['parse_seconds'] > 0 and metrics['elements_per_second'] > 0
+
+    def test_instrumenting_handler_callbacks(self, caplog):
+        monitor = ParseMonitor(reporter=logging_reporter(level=logging.WARNING))
+        handler = SingleTagChildrenHandler('prg-ad:PRG_PunktAdresowy', {'prg-ad:miejscowosc'}, {
+            'child_end': monitor.wrap(lambda handler, tagname: None),
+            'parent_end': monitor.wrap(lambda handler, tagname: handler.clear_content(), records=True)
+        })
+        monitor.parse(sample_xml, handler)
+
+        assert (monitor.elements, monitor.records) == (64, 2)
+        assert monitor.callback_seconds > 0
+        assert caplog.records[-1].getMessage().startswith('parsed 0.0MB, 64 elements')
+
+    def test_parsing_twice_with_handler(self):
+        handler = SingleTagChildrenHandler('prg-ad:PRG_PunktAdresowy', {'prg-ad:miejscowosc'}, {})
+        first_monitor, second_monitor = ParseMonitor(), ParseMonitor()
+        first_monitor.parse(sample_xml, handler)
+        second_monitor.parse(sample_xml, handler)
+        assert (first_monitor.elements, second_monitor.elements) == (64, 64)
+        assert 'startElement' not in vars(handler)